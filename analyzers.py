@@ -0,0 +1,115 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from extractor import PageExtractor, content_type_charset
+from tracing import Trace
+
+# Заголовки безопасности, попадающие в отчет
+SECURITY_HEADERS = {
+    'HSTS': 'Strict-Transport-Security',
+    'CSP': 'Content-Security-Policy',
+    'X-Frame-Options': 'X-Frame-Options',
+    'X-XSS-Protection': 'X-XSS-Protection',
+}
+
+
+def response_meta(response) -> Dict:
+    """
+    Компактные сведения об ответе, нужные анализаторам
+
+    Содержит только простые типы, поэтому передается в процессы
+    пула разбора вместо объекта requests.Response.
+    """
+    return {
+        'status': response.status_code,
+        'charset': content_type_charset(response.headers.get('Content-Type', '')),
+        'content_encoding': response.headers.get('Content-Encoding'),
+        'decoded_size': getattr(response, 'decoded_size', len(response.content)),
+        'transfer_size': getattr(response, 'transfer_size', len(response.content)),
+        'truncated': getattr(response, 'truncated', False),
+        'security_headers': {name: response.headers.get(header) for name, header in SECURITY_HEADERS.items()},
+        'cookies': {cookie.name: cookie.value for cookie in response.cookies},
+    }
+
+
+def analyze_performance(extracted: Dict, meta: Dict) -> Dict:
+    """Анализ производительности сайта"""
+    return {
+        'page_size': meta['decoded_size'] / 1024,  # размер в КБ
+        'transfer_size': meta['transfer_size'] / 1024,  # на проводе, КБ
+        'content_encoding': meta['content_encoding'],
+        'truncated': meta['truncated'],
+        'scripts_count': extracted['scripts_count'],
+        'styles_count': extracted['styles_count'],
+        'scripts': extracted['scripts'],
+        'stylesheets': extracted['stylesheets'],
+        'images': extracted['images']
+    }
+
+
+def analyze_seo(extracted: Dict, url: str, site_files: Dict) -> Dict:
+    """Расширенный SEO-анализ"""
+    seo_data = {
+        'headings': dict(extracted['headings']),
+        'links': {'internal': [], 'external': []},
+        'meta_tags': {},
+        'sitemap': site_files.get('sitemap'),
+        'robots': site_files.get('robots')
+    }
+
+    # Анализ ссылок
+    domain = url.split('//')[1].split('/')[0]
+    for href in extracted['links']:
+        if domain in href or href.startswith('/'):
+            seo_data['links']['internal'].append(href)
+        else:
+            seo_data['links']['external'].append(href)
+    return seo_data
+
+
+def analyze_security(meta: Dict) -> Dict:
+    """Расширенный анализ безопасности"""
+    return {
+        'headers': dict(meta['security_headers']),
+        'cookies': dict(meta['cookies']),
+    }
+
+
+def build_page(extracted: Dict, url: str, meta: Dict, site_files: Dict,
+               trace: Optional[Trace] = None) -> Dict:
+    """Запуск всех анализаторов по извлеченным метрикам страницы"""
+    trace = trace or Trace()
+    with trace.span('performance'):
+        performance_data = analyze_performance(extracted, meta)
+    with trace.span('seo'):
+        seo_data = analyze_seo(extracted, url, site_files)
+    with trace.span('security'):
+        security_data = analyze_security(meta)
+
+    return {
+        'title': extracted['title'] if extracted['title'] is not None else "Заголовок не найден",
+        'description': extracted['description'] if extracted['description'] is not None else "Описание не найдено",
+        'main_content': extracted['main_content'],
+        'content_blocks': extracted['content_blocks'],
+        'performance': performance_data,
+        'seo': seo_data,
+        'security': security_data,
+        'not_modified': False,
+    }
+
+
+def analyze_document(body: bytes, url: str, meta: Dict, site_files: Dict,
+                     backend: str = 'auto') -> Tuple[Dict, List[Dict]]:
+    """
+    Разбор страницы и анализ в процессе пула
+
+    Возвращает метрики страницы и замеры этапов (spans трассы),
+    которые вызывающий добавляет в свою трассу.
+    """
+    trace = Trace(url)
+    with trace.span('parse', backend=backend, pid=os.getpid()):
+        extractor = PageExtractor(backend, encoding=meta['charset'])
+        extractor.feed_bytes(body)
+        extracted = extractor.close()
+    page = build_page(extracted, url, meta, site_files, trace)
+    return page, trace.spans
@@ -0,0 +1,419 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from jobs import DONE, result_status
+from scheduler import RETRY_EXCEPTIONS
+from tracing import Trace
+
+# Таймауты этапов по умолчанию (в секундах)
+DEFAULT_STAGE_TIMEOUTS = {
+    'ssl': 10,
+    'fetch': 30,
+    'site_files': 10,
+    'parse': 60,
+    'resources': 60,
+    'ai': 120,
+}
+
+
+# Исключения, соответствующие исчерпанной квоте Gemini
+QUOTA_EXCEPTIONS = frozenset(['ResourceExhausted', 'TooManyRequests'])
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP-код ошибки (requests.HTTPError или google.api_core), если он известен"""
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if isinstance(code, int):
+        return code
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Класс ошибки этапа: timeout, quota, server, http, network, limit или other
+
+    Временные ошибки (timeout, quota, server, network) имеет смысл
+    повторять, http (4xx) и limit — как правило, нет.
+    """
+    name = type(error).__name__
+    status = error_status(error)
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or 'Timeout' in name or name == 'DeadlineExceeded':
+        return 'timeout'
+    if name in QUOTA_EXCEPTIONS or status == 429:
+        return 'quota'
+    if name in RETRY_EXCEPTIONS or (status is not None and status >= 500):
+        return 'server'
+    if status is not None and status >= 400:
+        return 'http'
+    if name == 'DownloadLimitError':
+        return 'limit'
+    if isinstance(error, (ConnectionError, OSError)):
+        return 'network'
+    return 'other'
+
+
+class StageError(Exception):
+    """Ошибка одного из этапов анализа"""
+
+    def __init__(self, stage: str, message: str, error_class: str = 'other'):
+        super().__init__(message)
+        self.stage = stage
+        self.error_class = error_class
+
+
+def url_problem(url: str) -> Optional[str]:
+    """
+    Причина, по которой URL нельзя анализировать, или None для корректного URL
+
+    Такие URL завершаются ошибкой этапа url класса invalid без обращения к сети.
+    """
+    try:
+        parts = urlsplit(url)
+        parts.port
+    except ValueError as e:
+        return f"Некорректный URL: {e}"
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return "Некорректный URL: ожидается адрес http:// или https:// с именем хоста"
+    return None
+
+
+def read_urls(source: str) -> List[str]:
+    """
+    Чтение списка URL из файла или stdin ('-')
+
+    Пустые строки и строки, начинающиеся с '#', пропускаются,
+    повторяющиеся URL удаляются с сохранением порядка.
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    urls = []
+    seen = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#') or line in seen:
+            continue
+        seen.add(line)
+        urls.append(line)
+    return urls
+
+
+class BatchAnalyzer:
+    """
+    Конкурентный анализ множества сайтов
+
+    Сетевые этапы (страница, robots.txt/sitemap.xml) выполняются
+    параллельно в пуле потоков, количество одновременно обрабатываемых
+    сайтов ограничивается глобально и для каждого хоста отдельно.
+    Разбор HTML и анализаторы выполняются в пуле из parse_workers
+    процессов (по умолчанию по числу ядер), при parse_workers=0 —
+    в потоках во время загрузки страницы. При deep=True после разбора
+    измеряется вес ресурсов страницы (ошибка этого этапа не прерывает анализ).
+    С очередью заданий (jobs.JobQueue) состояние и результат каждого
+    сайта записываются сразу по готовности, а отчет строится по всему заданию.
+    """
+
+    def __init__(self, parser, concurrency: int = 10, per_host: int = 2,
+                 timeouts: Optional[Dict[str, float]] = None, on_result=None, profiler=None,
+                 parse_workers: Optional[int] = None, deep: bool = False, keep_traces: bool = True,
+                 jobs=None, job_id: Optional[str] = None):
+        self.parser = parser
+        self.jobs = jobs
+        self.job_id = job_id
+        self.deep = deep
+        self.keep_traces = keep_traces
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else max(0, parse_workers)
+        self._process_pool = None
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeouts = dict(DEFAULT_STAGE_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.on_result = on_result
+        self.profiler = profiler
+        self.traces: List[Trace] = []
+        self.completed: List[Dict] = []
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def _host_limit(self, url: str):
+        """
+        Слот хоста на время анализа сайта
+
+        Семафор хоста удаляется, когда его никто не занимает и не ждет,
+        поэтому в долгоживущем сервисе словарь хостов не растет.
+        """
+        host = urlsplit(url).hostname or url
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+            self._host_users[host] = 0
+        self._host_users[host] += 1
+        try:
+            async with self._host_limits[host]:
+                yield
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_limits[host], self._host_users[host]
+
+    async def _stage(self, stage: str, func, *args, executor=None):
+        """Запуск блокирующего этапа в пуле потоков (или процессов) с таймаутом"""
+        loop = asyncio.get_running_loop()
+        timeout = self.timeouts.get(stage)
+        try:
+            if executor is not None:
+                call = loop.run_in_executor(executor, func, *args)
+            elif self.profiler:
+                call = loop.run_in_executor(self._executor, self.profiler.run, func, *args)
+            else:
+                call = loop.run_in_executor(self._executor, func, *args)
+            return await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            raise StageError(stage, f"Превышено время ожидания ({timeout} сек)", 'timeout')
+        except StageError:
+            raise
+        except Exception as e:
+            raise StageError(stage, str(e), classify_error(e))
+
+    async def _ai_stage(self, prompt: str, trace: Trace) -> str:
+        """Запрос к Gemini через асинхронный планировщик парсера"""
+        timeout = self.timeouts.get('ai')
+        try:
+            return await asyncio.wait_for(self.parser.generate_analysis_async(prompt, trace), timeout)
+        except asyncio.TimeoutError:
+            raise StageError('ai', f"Превышено время ожидания ({timeout} сек)", 'timeout')
+        except Exception as e:
+            raise StageError('ai', str(e), classify_error(e))
+
+    async def _ssl_stage(self, url: str, trace: Trace) -> Dict:
+        """Асинхронная проверка сертификата (результаты кэшируются по host:port)"""
+        host, port = self.parser.tls_target(url)
+        timeout = self.timeouts.get('ssl')
+        with trace.span('ssl'):
+            try:
+                return await asyncio.wait_for(self.parser.tls_scanner.scan(host, port), timeout)
+            except asyncio.TimeoutError:
+                return {'valid': False, 'error': f"Превышено время ожидания ({timeout} сек)"}
+
+    async def _parse_stage(self, url: str, response, site_files: Dict, trace: Trace) -> Dict:
+        """Разбор страницы в пуле процессов (или в потоке, если пул не используется)"""
+        if self._process_pool is None or response.status_code == 304:
+            return await self._stage('parse', self.parser.analyze_page, url, response, site_files, trace)
+
+        from analyzers import analyze_document, response_meta
+
+        page, spans = await self._stage(
+            'parse', analyze_document, response.content, url, response_meta(response),
+            site_files, self.parser.html_backend, executor=self._process_pool
+        )
+        trace.spans.extend(spans)
+        # Запись на диск — вне цикла событий
+        await self._stage('parse', self.parser.store_page, url, response, page)
+        return page
+
+    async def _collect(self, url: str, deep: bool, trace: Trace):
+        """Загрузка и разбор страницы, проверка сертификата и ресурсов: (page, ssl_info, load_time)"""
+        files_task = asyncio.ensure_future(self._stage('site_files', self.parser.fetch_site_files, url, self.timeouts['site_files'], trace))
+        # Для HTTP-сайтов сертификат проверяется параллельно с загрузкой
+        ssl_task = asyncio.ensure_future(self._ssl_stage(url, trace)) if url.startswith('http://') else None
+        try:
+            response = await self._stage('fetch', self.parser.fetch_page, url, self.timeouts['fetch'], trace,
+                                         self._process_pool is None)
+        except StageError:
+            files_task.cancel()
+            if ssl_task:
+                ssl_task.cancel()
+            raise
+        load_time = trace.total('fetch')
+
+        # Для HTTPS сертификат берется из соединения страницы
+        ssl_info = getattr(response, 'tls_info', None)
+        if ssl_info is None:
+            ssl_info = await (ssl_task or self._ssl_stage(url, trace))
+        elif ssl_task:
+            ssl_task.cancel()
+
+        try:
+            site_files = await files_task
+        except StageError:
+            site_files = {'robots': None, 'sitemap': None}
+
+        page = await self._parse_stage(url, response, site_files, trace)
+        if deep:
+            try:
+                await self._stage('resources', self.parser.analyze_resources, url, page, trace)
+            except StageError as e:
+                page['performance']['resources'] = {'error': str(e)}
+        return page, ssl_info, load_time
+
+    async def _job_call(self, func, *args):
+        """Запись в очередь заданий вне цикла событий"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, self.job_id, *args)
+
+    async def analyze_url(self, url: str, deep: Optional[bool] = None) -> Dict:
+        """
+        Полный анализ одного сайта (deep переопределяет режим анализатора)
+
+        В пакетном задании страница после разбора сохраняется как
+        контрольная точка: при продолжении задания загрузка, проверка
+        сертификата и разбор пропускаются, повторяется только запрос к Gemini.
+        """
+        url = self.parser.normalize_url(url)
+        deep = self.deep if deep is None else deep
+        trace = Trace(url)
+        if self.keep_traces:
+            self.traces.append(trace)
+        problem = url_problem(url)
+        if problem:
+            return self._error_result(url, StageError('url', problem, 'invalid'), trace)
+        try:
+            # Сначала слот хоста: задачи, ждущие занятый хост, не держат глобальные слоты
+            async with self._host_limit(url), self._global_limit:
+                return await self._analyze(url, deep, trace)
+        except StageError as e:
+            return self._error_result(url, e, trace)
+        except Exception as e:
+            # Непредвиденная ошибка одного сайта не должна прерывать весь пакет
+            return self._error_result(url, StageError('internal', str(e) or type(e).__name__, classify_error(e)), trace)
+
+    async def _analyze(self, url: str, deep: bool, trace: Trace) -> Dict:
+        checkpoint = None
+        if self.jobs:
+            with trace.span('checkpoint') as span:
+                checkpoint = await self._job_call(self.jobs.load_checkpoint, url, 'page')
+                span['restored'] = checkpoint is not None
+        if checkpoint is not None:
+            page, ssl_info, load_time = checkpoint['page'], checkpoint['ssl_info'], checkpoint['load_time']
+        else:
+            page, ssl_info, load_time = await self._collect(url, deep, trace)
+            if self.jobs:
+                await self._job_call(self.jobs.save_checkpoint, url, 'page',
+                                     {'page': page, 'ssl_info': ssl_info, 'load_time': load_time})
+        with trace.span('prompt'):
+            prompt = await self._stage('prompt', self.parser.build_prompt, url, page)
+        try:
+            analysis = await self._ai_stage(prompt, trace)
+        except StageError as e:
+            # Метрики сайта сохраняются и без ответа Gemini
+            result = self.parser.build_result(url, page, None, ssl_info, load_time, trace, str(e))
+            result['analysis_error_class'] = e.error_class
+            return result
+        return self.parser.build_result(url, page, analysis, ssl_info, load_time, trace)
+
+    @staticmethod
+    def _error_result(url: str, error: StageError, trace: Trace) -> Dict:
+        return {
+            'url': url,
+            'error': str(error),
+            'stage': error.stage,
+            'error_class': error.error_class,
+            'timestamp': datetime.now().isoformat(),
+            'timings': trace.timings(),
+        }
+
+    async def _run_one(self, url: str) -> Dict:
+        result = await self.analyze_url(url)
+        if self.jobs:
+            await self._job_call(self.jobs.finish, result)
+        self.completed.append(result)
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def start(self, expected: Optional[int] = None):
+        """
+        Создание лимитов и пулов (вызывается в цикле событий)
+        
+        expected — число сайтов, если оно известно: процессов разбора
+        создается не больше, чем сайтов.
+        """
+        self._global_limit = asyncio.Semaphore(self.concurrency)
+        self._host_limits = {}
+        self._host_users = {}
+        self.traces = []
+        self.completed = []
+        # Каждый сайт одновременно занимает до двух потоков (страница и robots/sitemap)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency * 2)
+        workers = self.parse_workers if expected is None else min(self.parse_workers, max(1, expected))
+        # spawn: процессы не наследуют потоки и соединения родителя
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+        ) if self.parse_workers else None
+
+    def stop(self):
+        """Остановка пулов потоков и процессов"""
+        self._executor.shutdown(wait=False)
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    async def run(self, urls: List[str]) -> Dict:
+        """Анализ списка сайтов и формирование сводного отчета"""
+        self.start(len(urls))
+        start_time = time.time()
+        try:
+            results = await asyncio.gather(*(self._run_one(url) for url in urls))
+        finally:
+            self.stop()
+
+        processed = len(results)
+        if self.jobs:
+            # Отчет по всему заданию, включая сайты из предыдущих запусков
+            results = self.jobs.results(self.job_id)
+
+        stage_totals: Dict[str, float] = {}
+        for trace in self.traces:
+            for stage, duration in trace.timings().items():
+                stage_totals[stage] = round(stage_totals.get(stage, 0.0) + duration, 6)
+
+        # Успешным, как и в очереди заданий, считается только сайт с ответом Gemini;
+        # сайты без анализа остаются в results (метрики собраны), но считаются отдельно
+        collected = [r for r in results if 'error' not in r]
+        failed = [r for r in results if 'error' in r]
+        succeeded = sum(1 for r in collected if result_status(r)['status'] == DONE)
+        scheduler = getattr(self.parser, 'scheduler', None)
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'summary': {
+                'total': len(results),
+                'processed': processed,
+                'succeeded': succeeded,
+                'failed': len(failed),
+                'elapsed': time.time() - start_time,
+                'concurrency': self.concurrency,
+                'per_host': self.per_host,
+                'parse_workers': self.parse_workers,
+                'stage_totals': stage_totals,
+                'ai_failed': len(collected) - succeeded,
+                'gemini': dict(scheduler.stats) if scheduler else None,
+            },
+            'results': collected,
+            'errors': failed,
+        }
+        if self.jobs:
+            job = self.jobs.get(self.job_id)
+            report['summary']['job'] = self.job_id
+            report['summary']['pending'] = job['counts']['pending']
+            report['summary']['error_classes'] = self.jobs.error_classes(self.job_id)
+        return report
+
+    def analyze(self, urls: List[str]) -> Dict:
+        """Синхронная обертка над run()"""
+        return asyncio.run(self.run(urls))
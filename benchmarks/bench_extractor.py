@@ -0,0 +1,104 @@
+"""
+Бенчмарк извлечения метрик страницы
+
+Сравнивает прежний разбор через BeautifulSoup (отдельный find_all на
+каждую метрику) с однопроходным PageExtractor на синтетических страницах.
+BeautifulSoup нужен только для сравнения (benchmarks/requirements.txt),
+без него измеряются только бэкенды PageExtractor.
+
+Запуск:
+    python benchmarks/bench_extractor.py --size-mb 2 --size-mb 5
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import extract_page, lxml_available  # noqa: E402
+
+
+def generate_page(size_mb: float, seed: int = 42) -> str:
+    """Синтетическая страница заданного размера со ссылками, картинками и текстом"""
+    rnd = random.Random(seed)
+    words = ['анализ', 'сайт', 'контент', 'performance', 'seo', 'ссылка', 'страница', 'data']
+    parts = [
+        '<!DOCTYPE html><html><head><title>Benchmark page</title>',
+        '<meta name="description" content="Synthetic benchmark page">',
+    ]
+    parts.extend(f'<link rel="stylesheet" href="/css/{i}.css">' for i in range(20))
+    parts.extend(f'<script src="/js/{i}.js"></script>' for i in range(30))
+    parts.append('</head><body>')
+    target = int(size_mb * 1024 * 1024)
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < target:
+        text = ' '.join(rnd.choice(words) for _ in range(40))
+        alt = ' alt="img"' if i % 3 else ''
+        block = (
+            f'<article><h{i % 6 + 1}>Раздел {i}</h{i % 6 + 1}><div class="row">'
+            f'<p>{text}</p><p>{text[:120]} <a href="/page/{i}">внутренняя</a> '
+            f'<a href="https://example{i % 50}.com/">внешняя</a></p>'
+            f'<img src="/img/{i}.png"{alt}>'
+            f'<span>{text[:60]}</span></div></article>\n'
+        )
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def legacy_extract(html: str) -> dict:
+    """Прежний способ: разбор в DOM и отдельный обход дерева на каждую метрику"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return {
+        'title': soup.title.string if soup.title else None,
+        'description': soup.find('meta', {'name': 'description'}),
+        'headings': {f'h{i}': len(soup.find_all(f'h{i}')) for i in range(1, 7)},
+        'scripts_count': len(soup.find_all('script')),
+        'styles_count': len(soup.find_all('link', rel='stylesheet')),
+        'images': [{'src': img.get('src', ''), 'alt': img.get('alt', '')} for img in soup.find_all('img')],
+        'links': [a.get('href') for a in soup.find_all('a') if a.get('href')],
+        'main_content': ' '.join(p.text for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'article'])),
+    }
+
+
+def measure(func, html: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, action='append', help='Размер страницы в МБ (можно несколько)')
+    parser.add_argument('--repeat', type=int, default=3, help='Число повторов, берется лучшее время')
+    args = parser.parse_args()
+
+    variants = []
+    if importlib.util.find_spec('bs4') is not None:
+        variants.append(('bs4 (прежний)', legacy_extract))
+    variants.append(('html.parser', lambda html: extract_page(html, 'html.parser')))
+    if lxml_available():
+        variants.append(('lxml', lambda html: extract_page(html, 'lxml')))
+
+    for size_mb in args.size_mb or [1, 5]:
+        html = generate_page(size_mb)
+        print(f"\nСтраница {len(html) / 1024 / 1024:.1f} МБ:")
+        baseline = None
+        for name, func in variants:
+            elapsed = measure(func, html, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {name:<15} {elapsed * 1000:9.1f} мс  x{baseline / elapsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+"""
+Бенчмарк полного анализа страниц без сети и Gemini
+
+Генерирует корпус страниц (небольшие, типичные и 5 МБ с тысячами ссылок
+и изображений), раздает его локальным HTTP-сервером и прогоняет через
+анализаторы, parse_website (одиночный путь) и BatchAnalyzer (пакетный
+путь) с заглушкой модели вместо genai.GenerativeModel. Для каждого
+сценария выводятся страницы в секунду, перцентили времени этапов и
+пиковое потребление памяти (RSS). Каждый сценарий запускается в
+отдельном процессе, чтобы пик памяти одного не влиял на другой.
+
+Результаты сохраняются как базовые (--save-baseline) и сравниваются
+с ними (--compare): при замедлении больше допуска код возврата 1.
+
+Запуск:
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baselines.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baselines.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_extractor import generate_page  # noqa: E402
+
+# Размеры страниц корпуса в МБ и число страниц каждого вида
+CORPUS = {
+    'small': (0.005, 40),
+    'typical': (0.1, 20),
+    'large': (5, 2),
+}
+
+SCENARIOS = ('analyzers', 'single', 'batch')
+PERCENTILES = (50, 90, 99)
+# Этапы, перцентили которых сравниваются с базовыми значениями
+COMPARED_STAGES = ('fetch', 'parse', 'performance', 'seo', 'prompt', 'gemini')
+# Минимальное замедление этапа (мс), которое считается регрессией
+NOISE_MS = 2.0
+
+# Без лимитов планировщика: измеряется сам анализ, а не бюджет запросов
+UNLIMITED_GEMINI = {'rpm': 1_000_000, 'tpm': 1_000_000_000}
+
+
+def build_corpus(scale: float = 1.0) -> dict:
+    """Страницы корпуса: путь -> HTML в байтах"""
+    pages = {}
+    for kind, (size_mb, count) in CORPUS.items():
+        for i in range(max(1, int(count * scale))):
+            pages[f'/{kind}/{i}.html'] = generate_page(size_mb, seed=i).encode('utf-8')
+    return pages
+
+
+class FixtureServer:
+    """Локальный HTTP-сервер корпуса (robots.txt и sitemap.xml тоже отдаются)"""
+
+    def __init__(self, pages: dict):
+        files = dict(pages)
+        files['/robots.txt'] = b'User-agent: *\nAllow: /\n'
+        files['/sitemap.xml'] = b'<?xml version="1.0"?><urlset></urlset>'
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Заголовки и тело пишутся отдельно: без TCP_NODELAY каждый ответ
+            # ждет задержанного ACK (~40 мс) и замеры показывают сервер, а не анализ
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                body = files.get(self.path.split('?', 1)[0])
+                self.send_response(200 if body is not None else 404)
+                body = body if body is not None else b'not found'
+                content_type = 'text/html; charset=utf-8' if self.path.endswith('.html') else 'text/plain'
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentile(values: list, p: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered), math.ceil(p / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb() -> dict:
+    """Пиковый RSS процесса и дочерних процессов (пул разбора), МБ"""
+    try:
+        import resource
+    except ImportError:
+        return {'self': None, 'children': None}
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1024 / 1024,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1024 / 1024,
+    }
+
+
+def stage_stats(timings: list) -> dict:
+    """Перцентили времени каждого этапа по всем страницам, мс"""
+    stages = {}
+    for page_timings in timings:
+        for stage, duration in page_timings.items():
+            stages.setdefault(stage, []).append(duration * 1000)
+    return {
+        stage: {f'p{p}': round(percentile(values, p), 3) for p in PERCENTILES}
+        for stage, values in stages.items()
+    }
+
+
+def make_parser(model_latency: float):
+    import main
+    from scheduler import StubModel
+
+    main.console.quiet = True
+    return main.ParsLinkAI(use_cache=False, model=StubModel(latency=model_latency),
+                           gemini_settings=UNLIMITED_GEMINI)
+
+
+def run_analyzers(pages: dict, args) -> tuple:
+    """Разбор и анализаторы в текущем процессе, без сети"""
+    from analyzers import analyze_document
+    from extractor import resolve_backend
+    from tracing import Trace
+
+    meta = {
+        'status': 200, 'charset': 'utf-8', 'content_encoding': None, 'truncated': False,
+        'security_headers': {}, 'cookies': {},
+    }
+    site_files = {'robots': None, 'sitemap': True}
+    backend = resolve_backend('auto')
+    timings = []
+    start = time.perf_counter()
+    for path, body in pages.items():
+        page_meta = dict(meta, decoded_size=len(body), transfer_size=len(body))
+        _, spans = analyze_document(body, f'http://bench.local{path}', page_meta, site_files, backend)
+        trace = Trace(path)
+        trace.spans = spans
+        timings.append(trace.timings())
+    return time.perf_counter() - start, timings, len(pages)
+
+
+def run_single(pages: dict, args) -> tuple:
+    """parse_website для каждой страницы по очереди"""
+    from tracing import Trace
+
+    parser = make_parser(args.model_latency)
+    timings = []
+    failed = 0
+    with FixtureServer(pages) as server:
+        start = time.perf_counter()
+        for path in pages:
+            trace = Trace(path)
+            if parser.parse_website(server.base_url + path, trace) is None:
+                failed += 1
+            timings.append(trace.timings())
+        elapsed = time.perf_counter() - start
+    parser.transport.close()
+    return elapsed, timings, len(pages) - failed
+
+
+def run_batch(pages: dict, args) -> tuple:
+    """BatchAnalyzer по всему корпусу"""
+    from batch import BatchAnalyzer
+
+    parser = make_parser(args.model_latency)
+    with FixtureServer(pages) as server:
+        batch = BatchAnalyzer(parser, concurrency=args.concurrency, per_host=args.concurrency,
+                              parse_workers=args.parse_workers)
+        start = time.perf_counter()
+        report = batch.analyze([server.base_url + path for path in pages])
+        elapsed = time.perf_counter() - start
+    parser.transport.close()
+    return elapsed, [trace.timings() for trace in batch.traces], report['summary']['succeeded']
+
+
+RUNNERS = {'analyzers': run_analyzers, 'single': run_single, 'batch': run_batch}
+
+
+def run_scenario(name: str, args) -> dict:
+    pages = build_corpus(args.scale)
+    elapsed, timings, succeeded = RUNNERS[name](pages, args)
+    return {
+        'pages': len(pages),
+        'succeeded': succeeded,
+        'elapsed': round(elapsed, 4),
+        'pages_per_sec': round(len(pages) / elapsed, 2) if elapsed else 0.0,
+        'stages': stage_stats(timings),
+        'peak_rss_mb': {key: round(value, 1) if value is not None else None for key, value in peak_rss_mb().items()},
+    }
+
+
+def spawn_scenario(name: str, args) -> dict:
+    """Запуск сценария в отдельном процессе с изолированным HOME"""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--scenario-worker', name,
+        '--scale', str(args.scale), '--model-latency', str(args.model_latency),
+        '--concurrency', str(args.concurrency),
+    ]
+    if args.parse_workers is not None:
+        command += ['--parse-workers', str(args.parse_workers)]
+    with tempfile.TemporaryDirectory() as home:
+        # Конфигурация и базы сохраняются во временный каталог, а не в ~/.parslinkai
+        env = dict(os.environ, HOME=home, USERPROFILE=home)
+        proc = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Сценарий {name} завершился с кодом {proc.returncode}:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def print_report(name: str, result: dict):
+    rss = result['peak_rss_mb']
+    rss_text = 'н/д' if rss['self'] is None else f"{rss['self']:.0f} МБ (пул: {rss['children']:.0f} МБ)"
+    print(f"\n{name}: {result['pages_per_sec']:.1f} стр/сек, {result['succeeded']}/{result['pages']} страниц "
+          f"за {result['elapsed']:.2f} сек, пиковый RSS {rss_text}")
+    for stage, values in result['stages'].items():
+        print(f"  {stage:<12} " + '  '.join(f"{key} {value:9.2f} мс" for key, value in values.items()))
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Регрессии относительно базовых значений"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        if result['pages_per_sec'] < base['pages_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['pages_per_sec']:.1f} стр/сек (базовое {base['pages_per_sec']:.1f})")
+        for stage in COMPARED_STAGES:
+            current = result['stages'].get(stage, {}).get('p90')
+            before = base['stages'].get(stage, {}).get('p90')
+            if current is None or not before:
+                continue
+            # Разница в несколько миллисекунд — шум планировщика ОС, а не регрессия
+            if current > before * (1 + tolerance) and current - before > NOISE_MS:
+                regressions.append(f"{name}/{stage}: p90 {current:.2f} мс (базовое {before:.2f} мс)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Сценарий (по умолчанию все)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Множитель числа страниц корпуса')
+    parser.add_argument('--model-latency', type=float, default=0.0, help='Задержка ответа заглушки модели, сек')
+    parser.add_argument('--concurrency', type=int, default=10, help='Конкурентность пакетного пути')
+    parser.add_argument('--parse-workers', type=int, default=None, help='Процессы разбора пакетного пути')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Сохранить результаты как базовые')
+    parser.add_argument('--compare', metavar='PATH', help='Сравнить с базовыми результатами')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Допустимое замедление (доля)')
+    parser.add_argument('--scenario-worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario_worker:
+        print(json.dumps(run_scenario(args.scenario_worker, args)))
+        return
+
+    sizes = ', '.join(f"{kind}: {count} x {size_mb:g} МБ" for kind, (size_mb, count) in CORPUS.items())
+    print(f"Корпус ({sizes}), масштаб {args.scale:g}")
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = spawn_scenario(name, args)
+        print_report(name, results[name])
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'scale': args.scale, 'scenarios': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\nБазовые результаты сохранены в {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"\nВнимание: базовые результаты получены с масштабом {baseline.get('scale')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nРегрессии (допуск {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nРегрессий нет (допуск {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Контроль времени запуска CLI
+
+Запускает легкие команды под `python -X importtime`, суммирует время
+импортов верхнего уровня и проверяет, что тяжелые зависимости не
+загружаются. Завершается с кодом 1 при превышении бюджета, поэтому
+подходит для проверки регрессий в CI.
+
+Запуск:
+    python benchmarks/bench_startup.py --budget-ms 150
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'main.py')
+
+# Команды, которым не нужны сеть, парсинг и Gemini
+COMMANDS = [['version'], ['cache']]
+
+# Модули, которые не должны импортироваться при запуске легких команд
+FORBIDDEN_MODULES = (
+    'google.generativeai',
+    'requests',
+    'urllib3',
+    'lxml',
+    'bs4',
+    'asyncio',
+)
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def run_importtime(args):
+    """Запуск команды и разбор вывода -X importtime"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', MAIN] + args,
+        capture_output=True, text=True, cwd=ROOT
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Команда {' '.join(args)} завершилась с кодом {proc.returncode}:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    top_level = 0
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules[name] = int(cumulative_us)
+        if not indent:
+            top_level += int(cumulative_us)
+    return wall, top_level, modules
+
+
+def interpreter_baseline() -> int:
+    """Время импортов пустого интерпретатора (site, encodings и т.д.)"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'], capture_output=True, text=True)
+    total = 0
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and not match.group(3):
+            total += int(match.group(2))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=150, help='Бюджет времени импортов сверх пустого интерпретатора, мс')
+    parser.add_argument('--runs', type=int, default=5, help='Число запусков каждой команды, берется медиана')
+    args = parser.parse_args()
+
+    baseline = statistics.median(interpreter_baseline() for _ in range(args.runs)) / 1000
+    print(f"Импорты пустого интерпретатора: {baseline:.1f} мс")
+
+    failed = False
+    for command in COMMANDS:
+        runs = [run_importtime(command) for _ in range(args.runs)]
+        wall = statistics.median(r[0] for r in runs) * 1000
+        imports = statistics.median(r[1] for r in runs) / 1000 - baseline
+        modules = runs[-1][2]
+        forbidden = [m for m in FORBIDDEN_MODULES if m in modules]
+
+        status = 'OK'
+        if imports > args.budget_ms or forbidden:
+            status = 'FAIL'
+            failed = True
+        print(f"\nmain.py {' '.join(command)}: {status}")
+        print(f"  импорты: {imports:.1f} мс (бюджет {args.budget_ms:.0f} мс), процесс: {wall:.1f} мс")
+        if forbidden:
+            print(f"  загружены тяжелые модули: {', '.join(forbidden)}")
+        heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+        for name, cumulative in heaviest:
+            print(f"    {name:<40} {cumulative / 1000:7.1f} мс")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def default_cache_dir() -> Path:
+    return Path.home() / '.parslinkai' / 'cache' / 'analysis'
+
+
+class AnalysisCache:
+    """
+    Кэш ответов Gemini на диске с адресацией по содержимому
+
+    Ключ — SHA-256 от имени модели и текста промпта, поэтому неизменившийся
+    сайт дает тот же ключ. Записи устаревают через ttl секунд после создания
+    (mtime), при превышении max_size байт удаляются давно не использовавшиеся
+    (LRU по atime, который обновляется при каждом попадании).
+    """
+
+    def __init__(self, directory: Optional[Path] = None, ttl: float = 7 * 24 * 3600,
+                 max_size: int = 100 * 1024 * 1024):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str, model: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(prompt.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.json'
+
+    def get(self, prompt: str, model: str) -> Optional[str]:
+        """Получение анализа из кэша или None"""
+        path = self._path(self.make_key(prompt, model))
+        try:
+            stat = path.stat()
+            if self.ttl and time.time() - stat.st_mtime > self.ttl:
+                self._remove(path, stat.st_size)
+                raise FileNotFoundError(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Обновляем время доступа для LRU-вытеснения, mtime остается временем создания
+            os.utime(path, (time.time(), stat.st_mtime))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry['analysis']
+
+    def set(self, prompt: str, model: str, analysis: str):
+        """Сохранение анализа в кэш"""
+        path = self._path(self.make_key(prompt, model))
+        entry = {'model': model, 'created': time.time(), 'analysis': analysis}
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+        if self.max_size and self.size() > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        entries = []
+        for path in self.directory.glob('*/*.json'):
+            try:
+                entries.append((path, path.stat()))
+            except OSError:
+                continue
+        return entries
+
+    def _remove(self, path: Path, size: int):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def size(self) -> int:
+        """Общий размер кэша в байтах"""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(stat.st_size for _, stat in self._entries())
+            return self._size
+
+    def evict(self):
+        """Удаление устаревших записей и вытеснение LRU до max_size"""
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda item: item[1].st_atime)
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            expired = self.ttl and now - stat.st_mtime > self.ttl
+            if not expired and (not self.max_size or total <= self.max_size * 0.9):
+                continue
+            self._remove(path, stat.st_size)
+            total -= stat.st_size
+        with self._lock:
+            self._size = total
+
+    def clear(self):
+        """Полная очистка кэша"""
+        for path, stat in self._entries():
+            self._remove(path, stat.st_size)
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> Dict:
+        entries = self._entries()
+        return {
+            'directory': str(self.directory),
+            'entries': len(entries),
+            'size': sum(stat.st_size for _, stat in entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
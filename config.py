@@ -2,8 +2,6 @@ import json
 import os
 from pathlib import Path
 from rich.console import Console
-from rich.prompt import Prompt
-from rich.panel import Panel
 
 console = Console()
 
@@ -16,7 +14,60 @@ class Config:
             'available_models': [
                 'gemini-pro',
                 'gemini-2.0-flash-exp'
-            ]
+            ],
+            'html_backend': 'auto',
+            'cache': {
+                'enabled': True,
+                'ttl': 7 * 24 * 3600,
+                'max_size_mb': 100,
+                'pages': True
+            },
+            'http': {
+                'pool_connections': 20,
+                'pool_maxsize': 10,
+                'retries': 2,
+                'backoff_factor': 0.5,
+                'http2': False,
+                'max_bytes': 10 * 1024 * 1024,
+                'max_decompression_ratio': 100
+            },
+            'gemini': {
+                'rpm': 15,
+                'tpm': 1000000,
+                'concurrency': 4,
+                'max_retries': 5,
+                'backoff_base': 2.0,
+                'backoff_max': 60,
+                'output_tokens': 1024,
+                'pack_sites': 1,
+                'pack_max_tokens': 8000,
+                'pack_wait': 0.5
+            },
+            'tls': {
+                'timeout': 10,
+                'concurrency': 100,
+                'ttl': 3600,
+                'max_entries': 10000
+            },
+            'results': {
+                'enabled': True,
+                'path': ''
+            },
+            'resources': {
+                'concurrency': 16,
+                'per_host': 6,
+                'timeout': 10,
+                'max_assets': 200,
+                'memo_size': 5000,
+                'memo_ttl': 3600
+            },
+            'prompt': {
+                'max_tokens': 600
+            },
+            'jobs': {
+                'enabled': True,
+                'path': ''
+            }
         }
         self.load_config()
 
@@ -44,6 +95,9 @@ class Config:
 
     def setup(self):
         """Настройка конфигурации через интерактивный интерфейс"""
+        from rich.prompt import Prompt
+        from rich.panel import Panel
+
         console.print(Panel.fit(
             "[bold cyan]ParsLinkAI[/bold cyan] - [green]Настройка конфигурации[/green]",
             border_style="cyan"
@@ -75,12 +129,13 @@ class Config:
         
         selected_model = available_models[int(model_index) - 1]
 
-        # Сохраняем новую конфигурацию
-        new_config = {
+        # Сохраняем новую конфигурацию, не теряя остальные настройки
+        new_config = dict(self.config)
+        new_config.update({
             'api_key': api_key,
             'model': selected_model,
             'available_models': available_models
-        }
+        })
         
         self.save_config(new_config)
         console.print("[green]Конфигурация успешно сохранена![/green]")
@@ -92,3 +147,55 @@ class Config:
     def get_model(self):
         """Получение выбранной модели"""
         return self.config.get('model', self.default_config['model'])
+
+    def get_http_settings(self):
+        """Получение настроек HTTP-транспорта"""
+        settings = dict(self.default_config['http'])
+        settings.update(self.config.get('http', {}))
+        return settings
+
+    def get_html_backend(self):
+        """Получение бэкенда парсинга HTML (auto, lxml, html.parser)"""
+        return self.config.get('html_backend', self.default_config['html_backend'])
+
+    def get_cache_settings(self):
+        """Получение настроек кэша анализов Gemini"""
+        settings = dict(self.default_config['cache'])
+        settings.update(self.config.get('cache', {}))
+        return settings
+
+    def get_gemini_settings(self):
+        """Получение настроек планировщика запросов к Gemini"""
+        settings = dict(self.default_config['gemini'])
+        settings.update(self.config.get('gemini', {}))
+        return settings
+
+    def get_results_settings(self):
+        """Получение настроек базы результатов анализа"""
+        settings = dict(self.default_config['results'])
+        settings.update(self.config.get('results', {}))
+        return settings
+
+    def get_tls_settings(self):
+        """Получение настроек проверки TLS-сертификатов"""
+        settings = dict(self.default_config['tls'])
+        settings.update(self.config.get('tls', {}))
+        return settings
+
+    def get_resources_settings(self):
+        """Получение настроек проверки ресурсов страницы (режим --deep)"""
+        settings = dict(self.default_config['resources'])
+        settings.update(self.config.get('resources', {}))
+        return settings
+
+    def get_prompt_settings(self):
+        """Получение настроек промпта Gemini (бюджет токенов)"""
+        settings = dict(self.default_config['prompt'])
+        settings.update(self.config.get('prompt', {}))
+        return settings
+
+    def get_jobs_settings(self):
+        """Получение настроек очереди пакетных заданий"""
+        settings = dict(self.default_config['jobs'])
+        settings.update(self.config.get('jobs', {}))
+        return settings
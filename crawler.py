@@ -0,0 +1,379 @@
+import asyncio
+import hashlib
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+from tracing import Trace
+
+# Начиная с этого лимита страниц вместо множества используется фильтр Блума
+BLOOM_THRESHOLD = 50_000
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_url(href: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Приведение URL к каноническому виду для дедупликации
+
+    Относительные ссылки разрешаются от base, схема и хост приводятся к
+    нижнему регистру, порт по умолчанию и фрагмент удаляются, параметры
+    запроса сортируются. Для не-HTTP ссылок (mailto:, javascript: и т.п.)
+    возвращается None.
+    """
+    href = href.strip()
+    if not href:
+        return None
+    url = urljoin(base, href) if base else href
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f'{netloc}:{port}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+def site_host(url: str) -> str:
+    """Хост сайта без префикса www. (www.example.com и example.com — один сайт)"""
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class BloomFilter:
+    """
+    Фильтр Блума для множества посещенных URL
+
+    Память фиксирована и не зависит от длины URL, ценой вероятности
+    ложного срабатывания error_rate (такая страница будет пропущена).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Добавление элемента, возвращает True, если его еще не было"""
+        added = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class UrlSet:
+    """Точное множество посещенных URL с тем же интерфейсом, что у BloomFilter"""
+
+    def __init__(self):
+        self._items = set()
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._items
+
+    def add(self, item: str) -> bool:
+        if item in self._items:
+            return False
+        self._items.add(item)
+        return True
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+
+class SiteRollup:
+    """
+    Сводка по сайту, накапливаемая по мере обхода
+
+    Хранятся только счетчики и несколько топ-списков, а не результаты
+    страниц целиком, поэтому память не растет с размером сайта.
+    """
+
+    TOP_SIZE = 10
+    SECURITY_HEADERS = ('HSTS', 'CSP', 'X-Frame-Options', 'X-XSS-Protection')
+
+    def __init__(self):
+        self.pages = 0
+        self.errors = 0
+        self.skipped = {'robots': 0, 'non_html': 0}
+        self.status_counts: Dict[str, int] = {}
+        self.depths: Dict[int, int] = {}
+        self.total_size = 0.0
+        self.total_load_time = 0.0
+        self.scripts = 0
+        self.styles = 0
+        self.images = 0
+        self.images_without_alt = 0
+        self.missing_title: List[str] = []
+        self.missing_description: List[str] = []
+        self.missing_h1: List[str] = []
+        self.multiple_h1: List[str] = []
+        self.security_headers = {header: 0 for header in self.SECURITY_HEADERS}
+        self.slowest: List[Tuple[float, str]] = []
+        self.largest: List[Tuple[float, str]] = []
+        self.broken: List[Dict] = []
+        self.stage_totals: Dict[str, float] = {}
+
+    def _sample(self, items: List[str], url: str):
+        if len(items) < self.TOP_SIZE:
+            items.append(url)
+
+    def _top(self, items: List[Tuple[float, str]], value: float, url: str):
+        items.append((value, url))
+        items.sort(reverse=True)
+        del items[self.TOP_SIZE:]
+
+    def add_page(self, url: str, depth: int, page: Dict, load_time: float, trace: Trace):
+        self.pages += 1
+        self.depths[depth] = self.depths.get(depth, 0) + 1
+        status = '304' if page.get('not_modified') else '200'
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+        performance = page['performance']
+        self.total_size += performance['page_size']
+        self.total_load_time += load_time
+        self.scripts += performance['scripts_count']
+        self.styles += performance['styles_count']
+        self.images += len(performance['images'])
+        self.images_without_alt += sum(1 for img in performance['images'] if not img['has_alt'])
+
+        if page['title'] == "Заголовок не найден" or not page['title']:
+            self._sample(self.missing_title, url)
+        if page['description'] == "Описание не найдено" or not page['description']:
+            self._sample(self.missing_description, url)
+        h1_count = page['seo']['headings'].get('h1', 0)
+        if h1_count == 0:
+            self._sample(self.missing_h1, url)
+        elif h1_count > 1:
+            self._sample(self.multiple_h1, url)
+        for header, value in page['security']['headers'].items():
+            if value and header in self.security_headers:
+                self.security_headers[header] += 1
+
+        self._top(self.slowest, load_time, url)
+        self._top(self.largest, performance['page_size'], url)
+        for stage, duration in trace.timings().items():
+            self.stage_totals[stage] = round(self.stage_totals.get(stage, 0.0) + duration, 6)
+
+    def add_error(self, url: str, depth: int, status: Optional[int], error: str):
+        self.errors += 1
+        key = str(status) if status else 'error'
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if len(self.broken) < self.TOP_SIZE * 10:
+            self.broken.append({'url': url, 'depth': depth, 'status': status, 'error': error})
+
+    def summary(self) -> Dict:
+        pages = self.pages or 1
+        return {
+            'pages': self.pages,
+            'errors': self.errors,
+            'skipped': dict(self.skipped),
+            'status_counts': dict(self.status_counts),
+            'depths': {str(depth): count for depth, count in sorted(self.depths.items())},
+            'performance': {
+                'total_size_kb': round(self.total_size, 2),
+                'avg_size_kb': round(self.total_size / pages, 2),
+                'avg_load_time': round(self.total_load_time / pages, 4),
+                'avg_scripts': round(self.scripts / pages, 2),
+                'avg_styles': round(self.styles / pages, 2),
+                'images': self.images,
+                'images_without_alt': self.images_without_alt,
+                'slowest': [{'url': url, 'load_time': round(value, 4)} for value, url in self.slowest],
+                'largest': [{'url': url, 'page_size': round(value, 2)} for value, url in self.largest],
+            },
+            'seo': {
+                'missing_title': self.missing_title,
+                'missing_description': self.missing_description,
+                'missing_h1': self.missing_h1,
+                'multiple_h1': self.multiple_h1,
+            },
+            'security_headers': {
+                header: round(count / pages * 100, 1) for header, count in self.security_headers.items()
+            },
+            'broken': self.broken,
+            'stage_totals': self.stage_totals,
+        }
+
+
+class SiteCrawler:
+    """
+    Обход сайта в ширину по внутренним ссылкам
+
+    Ссылки берутся из SEO-анализа каждой страницы, проверяются по уже
+    загруженному robots.txt и дедуплицируются по каноническому URL.
+    Запросы к одному хосту разделяются задержкой вежливости, страницы
+    загружаются и анализируются несколькими параллельными воркерами.
+    """
+
+    def __init__(self, parser, max_pages: int = 100, max_depth: int = 3, workers: int = 4,
+                 delay: float = 0.5, timeout: float = 30, use_bloom: Optional[bool] = None,
+                 user_agent: str = '*'):
+        self.parser = parser
+        self.max_pages = max(1, max_pages)
+        self.max_depth = max(0, max_depth)
+        self.workers = max(1, workers)
+        self.delay = max(0.0, delay)
+        self.timeout = timeout
+        self.user_agent = user_agent
+        if use_bloom is None:
+            use_bloom = self.max_pages > BLOOM_THRESHOLD
+        self.seen = BloomFilter(self.max_pages * 4) if use_bloom else UrlSet()
+        self.rollup = SiteRollup()
+        self.robots: Optional[RobotFileParser] = None
+        self._enqueued = 0
+        self._next_request: Dict[str, float] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+
+    def _allowed(self, url: str) -> bool:
+        return self.robots is None or self.robots.can_fetch(self.user_agent, url)
+
+    async def _wait_turn(self, url: str):
+        """Соблюдение задержки между запросами к одному хосту"""
+        host = urlsplit(url).hostname or ''
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        loop = asyncio.get_running_loop()
+        async with lock:
+            wait = self._next_request.get(host, 0.0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request[host] = loop.time() + self.delay
+
+    def _load_robots(self, start_url: str) -> Dict:
+        """Загрузка robots.txt и sitemap.xml с корня сайта"""
+        parts = urlsplit(start_url)
+        site_files = self.parser.fetch_site_files(f'{parts.scheme}://{parts.netloc}/', timeout=self.timeout)
+        if site_files.get('robots'):
+            robots = RobotFileParser()
+            robots.parse(site_files['robots'].splitlines())
+            self.robots = robots
+            crawl_delay = robots.crawl_delay(self.user_agent)
+            if crawl_delay:
+                self.delay = max(self.delay, float(crawl_delay))
+        return site_files
+
+    def _enqueue(self, queue: asyncio.Queue, url: str, depth: int) -> bool:
+        if self._enqueued >= self.max_pages or not self.seen.add(url):
+            return False
+        if not self._allowed(url):
+            self.rollup.skipped['robots'] += 1
+            return False
+        self._enqueued += 1
+        queue.put_nowait((url, depth))
+        return True
+
+    def _discover(self, queue: asyncio.Queue, page_url: str, page: Dict, depth: int):
+        if depth >= self.max_depth:
+            return
+        host = site_host(page_url)
+        links = page['seo']['links']
+        for href in links['internal'] + links['external']:
+            url = canonical_url(href, page_url)
+            if url and site_host(url) == host:
+                self._enqueue(queue, url, depth + 1)
+
+    def _process(self, url: str, depth: int, site_files: Dict):
+        """Загрузка и анализ одной страницы (выполняется в пуле потоков)"""
+        trace = Trace(url)
+        response = self.parser.fetch_page(url, timeout=self.timeout, trace=trace)
+        content_type = response.headers.get('Content-Type', 'text/html')
+        if response.status_code != 304 and 'html' not in content_type.lower():
+            return None, trace
+        page = self.parser.analyze_page(url, response, site_files, trace=trace)
+        return page, trace
+
+    async def _worker(self, queue: asyncio.Queue, site_files: Dict):
+        while True:
+            url, depth = await queue.get()
+            try:
+                await self._crawl_one(queue, url, depth, site_files)
+            except Exception as e:
+                # Воркер продолжает работу: иначе очередь может не опустеть и join() зависнет
+                self.rollup.add_error(url, depth, None, f"Ошибка обработки страницы: {e}")
+            finally:
+                queue.task_done()
+
+    async def _crawl_one(self, queue: asyncio.Queue, url: str, depth: int, site_files: Dict):
+        await self._wait_turn(url)
+        loop = asyncio.get_running_loop()
+        try:
+            page, trace = await loop.run_in_executor(self._executor, self._process, url, depth, site_files)
+        except Exception as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            self.rollup.add_error(url, depth, status, str(e))
+            return
+        if page is None:
+            self.rollup.skipped['non_html'] += 1
+            return
+        self.rollup.add_page(url, depth, page, trace.total('fetch'), trace)
+        self._discover(queue, url, page, depth)
+
+    async def run(self, start_url: str) -> Dict:
+        """Обход сайта начиная с start_url и формирование сводки"""
+        start_url = canonical_url(self.parser.normalize_url(start_url))
+        if not start_url:
+            raise ValueError("Некорректный начальный URL")
+        started = time.time()
+        loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            site_files = await loop.run_in_executor(self._executor, self._load_robots, start_url)
+            queue: asyncio.Queue = asyncio.Queue()
+            # Стартовая страница анализируется даже при запрете в robots.txt:
+            # ее явно указал пользователь
+            self.seen.add(start_url)
+            self._enqueued = 1
+            queue.put_nowait((start_url, 0))
+            workers = [asyncio.ensure_future(self._worker(queue, site_files)) for _ in range(self.workers)]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            self._executor.shutdown(wait=False)
+
+        return {
+            'url': start_url,
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': time.time() - started,
+            'settings': {
+                'max_pages': self.max_pages,
+                'max_depth': self.max_depth,
+                'workers': self.workers,
+                'delay': self.delay,
+                'dedup': 'bloom' if isinstance(self.seen, BloomFilter) else 'set',
+            },
+            'robots': site_files.get('robots') is not None,
+            'sitemap': bool(site_files.get('sitemap')),
+            'rollup': self.rollup.summary(),
+        }
+
+    def crawl(self, start_url: str) -> Dict:
+        """Синхронная обертка над run()"""
+        return asyncio.run(self.run(start_url))
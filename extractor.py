@@ -0,0 +1,475 @@
+import codecs
+import re
+from html.parser import HTMLParser
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+# Теги, текст внутри которых не является контентом
+SKIP_TEXT_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+
+# Блоки текста (абзацы): вложенные блоки входят в текст внешнего
+SEGMENT_TAGS = frozenset(['p', 'li', 'pre', 'blockquote', 'dd', 'dt', 'figcaption']) | HEADING_TAGS
+# Контейнеры, среди которых выбирается основной контент страницы
+CONTAINER_TAGS = frozenset([
+    'html', 'body', 'div', 'section', 'article', 'main', 'table', 'td', 'ul', 'ol', 'dl',
+    'nav', 'header', 'footer', 'aside', 'form', 'figure', 'details', 'center',
+])
+# Контейнеры навигации и оформления, текст которых не считается контентом
+BOILERPLATE_TAGS = frozenset(['nav', 'header', 'footer', 'aside', 'form'])
+BOILERPLATE_HINTS = re.compile(
+    r'comment|footer|header|menu|nav|sidebar|sponsor|advert|banner|cookie|popup|modal|'
+    r'share|social|related|breadcrumb|widget|subscribe|promo|^ad-|-ad$', re.IGNORECASE
+)
+CONTENT_HINTS = re.compile(r'article|content|main|post|entry|text|story|body', re.IGNORECASE)
+# Теги, у которых признаки оформления в class/id не проверяются
+NEVER_BOILERPLATE = frozenset(['html', 'body', 'main', 'article'])
+
+# Блоки короче этого (кроме заголовков) не попадают в основной контент
+MIN_SEGMENT_CHARS = 25
+# Блоки, в которых ссылки занимают большую долю текста, считаются навигацией
+MAX_LINK_DENSITY = 0.5
+# Соседние контейнеры с оценкой не ниже этой доли лучшего тоже входят в контент
+SIBLING_SHARE = 0.2
+HEADING_VALUE = {'h1': 4.0, 'h2': 3.0, 'h3': 2.5, 'h4': 2.0, 'h5': 2.0, 'h6': 2.0}
+
+BACKENDS = ('auto', 'lxml', 'html.parser')
+
+# Сколько байт начала документа просматривается в поисках <meta charset>
+SNIFF_BYTES = 4096
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def content_type_charset(content_type: str) -> Optional[str]:
+    """Кодировка, явно указанная в заголовке Content-Type"""
+    _, _, charset = content_type.lower().partition('charset=')
+    return charset.split(';')[0].strip(' "\'') or None
+
+
+def sniff_encoding(head: bytes) -> Optional[str]:
+    """Кодировка по BOM или <meta charset> в начале документа"""
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = META_CHARSET.search(head[:SNIFF_BYTES])
+    return match.group(1).decode('ascii') if match else None
+
+
+@lru_cache(maxsize=4096)
+def container_hints(css_class: str, element_id: str) -> Tuple[float, bool]:
+    """Бонус к оценке и признак оформления по class/id контейнера"""
+    hints = f"{css_class} {element_id}"
+    if CONTENT_HINTS.search(hints):
+        return 25.0, False
+    return 0.0, bool(BOILERPLATE_HINTS.search(hints))
+
+
+class PageCollector:
+    """
+    Сбор метрик страницы за один проход по потоку событий парсера
+
+    Реализует интерфейс target-парсера lxml (start/end/data/close),
+    тот же интерфейс вызывает и адаптер для html.parser. DOM не строится,
+    сохраняются только счетчики, атрибуты и блоки текста.
+
+    Основной контент выбирается по плотности текста, как в readability:
+    каждый блок (абзац, пункт списка, заголовок) добавляет оценку своему
+    контейнеру и половину — контейнеру уровнем выше; оценка контейнера
+    уменьшается пропорционально доле текста ссылок. В контент попадают
+    блоки лучшего контейнера (и соседних контейнеров с высокой оценкой)
+    без навигации, повторов и блоков из шапки, меню и подвала.
+    """
+
+    def __init__(self):
+        self.title: Optional[str] = None
+        self.description: Optional[str] = None
+        self.headings = {f'h{i}': 0 for i in range(1, 7)}
+        self.scripts_count = 0
+        self.styles_count = 0
+        self.images: List[Dict] = []
+        self.links: List[str] = []
+        self.scripts: List[str] = []
+        self.stylesheets: List[str] = []
+        # (тег, текст, доля ссылок, контейнер, ценность)
+        self.segments: List[Tuple] = []
+
+        self._title_parts: Optional[List[str]] = None
+        self._skip_depth = 0
+        self._link_depth = 0
+        # Контейнеры: (тег, цепочка от себя к корню, признак оформления, бонус за class/id)
+        self._containers: List[tuple] = []
+        self._container_stack: List[int] = []
+        self._segment: Optional[Dict] = None
+        # Текст текущего контейнера вне блоков
+        self._loose_parts: List[str] = []
+        self._loose_links = 0
+
+    def _current_container(self) -> Optional[int]:
+        return self._container_stack[-1] if self._container_stack else None
+
+    def start(self, tag: str, attrs):
+        tag = tag.lower()
+        if tag in SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+            if tag == 'script':
+                self.scripts_count += 1
+                if attrs.get('src'):
+                    self.scripts.append(attrs['src'])
+        elif tag == 'title':
+            if self.title is None and self._title_parts is None:
+                self._title_parts = []
+        elif tag == 'meta':
+            if self.description is None and (attrs.get('name') or '').lower() == 'description':
+                self.description = attrs.get('content') or ''
+        elif tag == 'link':
+            if 'stylesheet' in (attrs.get('rel') or '').lower().split():
+                self.styles_count += 1
+                if attrs.get('href'):
+                    self.stylesheets.append(attrs['href'])
+        elif tag == 'img':
+            alt = attrs.get('alt') or ''
+            self.images.append({
+                'src': attrs.get('src') or '',
+                'alt': alt,
+                'has_alt': bool(alt),
+            })
+        elif tag == 'a':
+            href = attrs.get('href')
+            if href:
+                self.links.append(href)
+            self._link_depth += 1
+
+        if tag in HEADING_TAGS:
+            self.headings[tag] += 1
+        if tag in CONTAINER_TAGS:
+            self._open_container(tag, attrs)
+        elif tag in SEGMENT_TAGS:
+            self._open_segment(tag)
+
+    def _open_container(self, tag: str, attrs):
+        # <p> не может содержать блочных элементов: незакрытый абзац закрывается
+        if self._segment is not None and self._segment['tag'] == 'p':
+            self._close_segment()
+        if self._segment is None and self._loose_parts:
+            self._flush_loose()
+        parent = self._current_container()
+        boilerplate = tag in BOILERPLATE_TAGS or (parent is not None and self._containers[parent][2])
+        index = len(self._containers)
+        chain = (index,) + self._containers[parent][1] if parent is not None else (index,)
+        bonus = 0.0
+        if tag not in NEVER_BOILERPLATE:
+            hints = (attrs.get('class') or '', attrs.get('id') or '')
+            if hints[0] or hints[1]:
+                bonus, hinted_boilerplate = container_hints(*hints)
+                boilerplate = boilerplate or hinted_boilerplate
+        if tag in ('article', 'main'):
+            bonus = 25.0
+        self._containers.append((tag, chain, boilerplate, bonus))
+        self._container_stack.append(index)
+
+    def _open_segment(self, tag: str):
+        if self._segment is not None:
+            # <p> и <li> закрываются следующим соседним блоком,
+            # остальные вложенные блоки входят в текст внешнего
+            if self._segment['tag'] == 'p' or (tag == 'li' and self._segment['tag'] == 'li'):
+                self._close_segment()
+            else:
+                return
+        if self._loose_parts:
+            self._flush_loose()
+        self._segment = {'tag': tag, 'parts': [], 'link_chars': 0, 'container': self._current_container()}
+
+    def end(self, tag: str):
+        tag = tag.lower()
+        if tag in SKIP_TEXT_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+        elif tag == 'a':
+            self._link_depth = max(0, self._link_depth - 1)
+        elif tag in SEGMENT_TAGS:
+            if self._segment is not None and self._segment['tag'] == tag:
+                self._close_segment()
+        elif tag in CONTAINER_TAGS:
+            self._close_container(tag)
+
+    def _close_container(self, tag: str):
+        stack = self._container_stack
+        containers = self._containers
+        position = len(stack) - 1
+        while position >= 0 and containers[stack[position]][0] != tag:
+            position -= 1
+        if position < 0:
+            return
+        # Незакрытый блок внутри контейнера заканчивается вместе с ним
+        if self._segment is not None and self._segment['container'] in stack[position:]:
+            self._close_segment()
+        if self._loose_parts:
+            self._flush_loose()
+        del stack[position:]
+
+    def data(self, text: str):
+        if self._skip_depth:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(text)
+            return
+        segment = self._segment
+        if segment is None:
+            # Пробелы между тегами до первого текста не начинают блок
+            if not self._loose_parts and text.isspace():
+                return
+            self._loose_parts.append(text)
+            if self._link_depth:
+                self._loose_links += len(text.strip())
+            return
+        segment['parts'].append(text)
+        if self._link_depth:
+            segment['link_chars'] += len(text.strip())
+
+    def _close_segment(self):
+        segment = self._segment
+        self._segment = None
+        self._add_segment(segment['tag'], segment['parts'], segment['link_chars'], segment['container'])
+
+    def _flush_loose(self):
+        """Текст контейнера вне блоков (например, <div> без <p>) — отдельный блок"""
+        if not self._loose_parts:
+            return
+        container = self._current_container()
+        tag = self._containers[container][0] if container is not None else 'body'
+        self._add_segment(tag, self._loose_parts, self._loose_links, container)
+        self._loose_parts = []
+        self._loose_links = 0
+
+    def _add_segment(self, tag: str, parts: List[str], link_chars: int, container: Optional[int]):
+        text = ' '.join(''.join(parts).split())
+        if not text:
+            return
+        length = len(text)
+        # Ценность блока: длина и число запятых (признак связного текста)
+        value = 1 + text.count(',') + min(length / 100, 3) if length >= MIN_SEGMENT_CHARS else 0.0
+        self.segments.append((tag, text, min(1.0, link_chars / length), container, value))
+
+    def close(self) -> Dict:
+        if self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+        if self._segment is not None:
+            self._close_segment()
+        self._flush_loose()
+        return self.result()
+
+    def _chain(self, container: Optional[int]) -> tuple:
+        return self._containers[container][1] if container is not None else ()
+
+    def _parent(self, container: int) -> Optional[int]:
+        chain = self._containers[container][1]
+        return chain[1] if len(chain) > 1 else None
+
+    def content_blocks(self) -> List[Dict]:
+        """Блоки основного контента в порядке документа с оценкой ценности"""
+        containers = self._containers
+        scores: Dict[int, float] = {}
+        text_chars: Dict[int, float] = {}
+        link_chars: Dict[int, float] = {}
+        candidates = []
+        for segment in self.segments:
+            _, text, density, container, value = segment
+            if container is not None and containers[container][2]:
+                continue
+            candidates.append(segment)
+            if container is None:
+                continue
+            length = len(text)
+            text_chars[container] = text_chars.get(container, 0) + length
+            link_chars[container] = link_chars.get(container, 0.0) + length * density
+            if not value:
+                continue
+            scores[container] = scores.get(container, containers[container][3]) + value
+            parent = self._parent(container)
+            if parent is not None:
+                scores[parent] = scores.get(parent, containers[parent][3]) + value / 2
+
+        # Объем текста и ссылок каждого контейнера вместе с вложенными:
+        # вложенные контейнеры всегда имеют больший номер, чем родитель
+        for index in range(len(containers) - 1, 0, -1):
+            if index not in text_chars:
+                continue
+            parent = self._parent(index)
+            if parent is not None:
+                text_chars[parent] = text_chars.get(parent, 0) + text_chars[index]
+                link_chars[parent] = link_chars.get(parent, 0.0) + link_chars[index]
+
+        selected = candidates
+        if scores:
+            final = {
+                index: score * (1 - link_chars[index] / text_chars[index])
+                for index, score in scores.items() if text_chars.get(index)
+            }
+            best = max(final, key=final.get)
+            parent = self._parent(best)
+            chosen = {best} | {
+                index for index, score in final.items()
+                if index != best and parent is not None and self._parent(index) == parent
+                and score >= max(10.0, final[best] * SIBLING_SHARE)
+            }
+            inside: Dict[Optional[int], bool] = {}
+            selected = []
+            for segment in candidates:
+                container = segment[3]
+                if container not in inside:
+                    inside[container] = any(index in chosen for index in self._chain(container))
+                # Заголовок h1 часто стоит вне контейнера статьи, но остается в контенте
+                if inside[container] or segment[0] == 'h1':
+                    selected.append(segment)
+
+        blocks = []
+        seen = set()
+        for tag, text, density, _, value in selected:
+            heading = HEADING_VALUE.get(tag)
+            if text in seen or density > MAX_LINK_DENSITY:
+                continue
+            if not heading and not value:
+                continue
+            seen.add(text)
+            value = heading or value * (1 - density)
+            blocks.append({'tag': tag, 'text': text, 'score': round(value, 3)})
+        return blocks
+
+    def result(self) -> Dict:
+        # Блоки хранятся как отрезки main_content, чтобы текст не дублировался
+        parts: List[str] = []
+        blocks: List[Dict] = []
+        offset = 0
+        for block in self.content_blocks():
+            if parts:
+                offset += 1
+            end = offset + len(block['text'])
+            blocks.append({'tag': block['tag'], 'score': block['score'], 'start': offset, 'end': end})
+            parts.append(block['text'])
+            offset = end
+        return {
+            'title': self.title,
+            'description': self.description,
+            'headings': dict(self.headings),
+            'scripts_count': self.scripts_count,
+            'styles_count': self.styles_count,
+            'images': self.images,
+            'links': self.links,
+            'scripts': self.scripts,
+            'stylesheets': self.stylesheets,
+            'main_content': ' '.join(parts),
+            'content_blocks': blocks,
+        }
+
+
+class _StdlibParser(HTMLParser):
+    """Адаптер html.parser к интерфейсу PageCollector"""
+
+    def __init__(self, collector: PageCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {name: value for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, {name: value for name, value in attrs})
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def lxml_available() -> bool:
+    try:
+        import lxml.etree  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+    """Выбор доступного бэкенда парсинга"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд парсинга: {backend}. Доступны: {', '.join(BACKENDS)}")
+    if backend == 'auto':
+        return 'lxml' if lxml_available() else 'html.parser'
+    if backend == 'lxml' and not lxml_available():
+        raise ValueError("Бэкенд lxml недоступен: установите пакет lxml")
+    return backend
+
+
+class PageExtractor:
+    """
+    Потоковый извлекатель метрик страницы
+
+    Данные можно передавать частями через feed() по мере загрузки,
+    итоговые метрики возвращает close(). feed_bytes() принимает байты:
+    кодировка берется из encoding (заголовок Content-Type), BOM или
+    <meta charset>, иначе используется UTF-8.
+    """
+
+    def __init__(self, backend: str = 'auto', encoding: Optional[str] = None):
+        self.backend = resolve_backend(backend)
+        self.encoding = encoding
+        self.collector = PageCollector()
+        self._decoder = None
+        self._head = b''
+        if self.backend == 'lxml':
+            from lxml import etree
+            self._parser = etree.HTMLParser(target=self.collector)
+        else:
+            self._parser = _StdlibParser(self.collector)
+
+    def feed(self, data: str):
+        self._parser.feed(data)
+
+    def feed_bytes(self, data: bytes):
+        if self._decoder is None:
+            # Начало документа накапливается до определения кодировки
+            self._head += data
+            if len(self._head) >= SNIFF_BYTES:
+                self._start_decoding()
+            return
+        self.feed(self._decoder.decode(data))
+
+    def _start_decoding(self):
+        encoding = self.encoding or sniff_encoding(self._head) or 'utf-8'
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            encoding = 'utf-8'
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.encoding = encoding
+        head, self._head = self._head, b''
+        self.feed(self._decoder.decode(head))
+
+    def close(self) -> Dict:
+        if self._decoder is None and self._head:
+            self._start_decoding()
+        if self._decoder is not None:
+            self.feed(self._decoder.decode(b'', final=True))
+        if self.backend == 'lxml':
+            from lxml import etree
+            # lxml вызывает PageCollector.close() и возвращает его результат
+            try:
+                return self._parser.close()
+            except etree.XMLSyntaxError:
+                # Пустой документ: lxml не нашел ни одного элемента
+                return self.collector.close()
+        self._parser.close()
+        return self.collector.close()
+
+
+def extract_page(html: str, backend: str = 'auto') -> Dict:
+    """Извлечение всех метрик страницы за один проход"""
+    extractor = PageExtractor(backend)
+    extractor.feed(html)
+    return extractor.close()
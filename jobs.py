@@ -0,0 +1,247 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Версия схемы базы (PRAGMA user_version)
+SCHEMA_VERSION = 1
+
+# Состояния URL в задании
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    source TEXT,
+    options TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_urls (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    checkpoint TEXT,
+    error TEXT,
+    error_stage TEXT,
+    error_class TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated TEXT,
+    result TEXT,
+    PRIMARY KEY (job_id, url)
+);
+CREATE INDEX IF NOT EXISTS idx_job_urls_status ON job_urls(job_id, status, position);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created TEXT NOT NULL,
+    PRIMARY KEY (job_id, url, stage),
+    FOREIGN KEY (job_id, url) REFERENCES job_urls(job_id, url) ON DELETE CASCADE
+);
+"""
+
+
+def default_jobs_path() -> Path:
+    return Path.home() / '.parslinkai' / 'jobs.db'
+
+
+def new_job_id(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now()).strftime('%Y%m%d-%H%M%S')
+
+
+def result_status(result: Dict) -> Dict:
+    """
+    Состояние URL по результату анализа
+
+    Результат без ответа Gemini считается неудачным (этап ai): при
+    повторе используется сохраненная страница и повторяется только запрос.
+    """
+    if 'error' in result:
+        return {'status': FAILED, 'error': result['error'], 'error_stage': result.get('stage'),
+                'error_class': result.get('error_class')}
+    if result.get('analysis_error'):
+        return {'status': FAILED, 'error': result['analysis_error'], 'error_stage': 'ai',
+                'error_class': result.get('analysis_error_class')}
+    return {'status': DONE, 'error': None, 'error_stage': None, 'error_class': None}
+
+
+class JobQueue:
+    """
+    Очередь пакетных заданий на диске (SQLite)
+
+    Для каждого URL задания хранятся состояние (pending, done, failed),
+    класс и этап ошибки, число попыток и итоговый результат. Контрольные
+    точки этапов (метрики страницы после загрузки и разбора) позволяют
+    при продолжении задания не загружать страницу повторно. Состояние
+    записывается сразу по завершении сайта, поэтому после сбоя или
+    Ctrl+C теряются только сайты, которые обрабатывались в этот момент.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_jobs_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+        self._migrate()
+
+    def _migrate(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with self._db:
+                self._db.executescript(SCHEMA)
+                self._db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def _exists(self, job_id: str) -> bool:
+        return self._db.execute('SELECT 1 FROM jobs WHERE id = ?', (job_id,)).fetchone() is not None
+
+    def create(self, urls: Iterable[str], options: Dict, source: Optional[str] = None,
+               job_id: Optional[str] = None) -> str:
+        """Новое задание; без job_id идентификатор строится по текущему времени"""
+        now = datetime.now()
+        with self._lock, self._db:
+            if job_id is not None:
+                if self._exists(job_id):
+                    raise ValueError(f"Задание {job_id} уже существует")
+            else:
+                base = job_id = new_job_id(now)
+                suffix = 1
+                while self._exists(job_id):
+                    suffix += 1
+                    job_id = f"{base}-{suffix}"
+            self._db.execute(
+                'INSERT INTO jobs (id, created, updated, source, options) VALUES (?, ?, ?, ?, ?)',
+                (job_id, now.isoformat(), now.isoformat(), source, json.dumps(options))
+            )
+            self._db.executemany(
+                'INSERT OR IGNORE INTO job_urls (job_id, position, url, status) VALUES (?, ?, ?, ?)',
+                [(job_id, position, url, PENDING) for position, url in enumerate(urls)]
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Задание с параметрами и числом URL в каждом состоянии"""
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = self._db.execute(
+                'SELECT status, COUNT(*) FROM job_urls WHERE job_id = ? GROUP BY status', (job_id,)
+            ).fetchall()
+        job = dict(row, options=json.loads(row['options']))
+        job['counts'] = {PENDING: 0, DONE: 0, FAILED: 0}
+        job['counts'].update({status: count for status, count in counts})
+        job['total'] = sum(job['counts'].values())
+        return job
+
+    def jobs(self, limit: int = 20) -> List[Dict]:
+        """Последние задания (от новых к старым)"""
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                'SELECT id FROM jobs ORDER BY created DESC, id DESC LIMIT ?', (limit,)
+            )]
+        return [self.get(job_id) for job_id in ids]
+
+    def urls(self, job_id: str, retry_failed: bool = False,
+             error_classes: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        URL для обработки в порядке исходного списка
+
+        По умолчанию — необработанные URL (в том числе прерванные сбоем),
+        при retry_failed — только завершившиеся ошибкой (при заданных
+        error_classes — только ошибки этих классов).
+        """
+        sql = 'SELECT url FROM job_urls WHERE job_id = ? AND status = ?'
+        params: list = [job_id, FAILED if retry_failed else PENDING]
+        classes = list(error_classes or ())
+        if retry_failed and classes:
+            sql += f" AND error_class IN ({', '.join('?' * len(classes))})"
+            params += classes
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql + ' ORDER BY position', params)]
+
+    def error_classes(self, job_id: str) -> Dict[str, int]:
+        """Число неудачных URL по классам ошибок"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT COALESCE(error_class, error_stage, \'other\'), COUNT(*) FROM job_urls '
+                'WHERE job_id = ? AND status = ? GROUP BY 1 ORDER BY 2 DESC', (job_id, FAILED)
+            ).fetchall()
+        return {name: count for name, count in rows}
+
+    def failures(self, job_id: str, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT url, error, error_stage, error_class, attempts, checkpoint FROM job_urls '
+                'WHERE job_id = ? AND status = ? ORDER BY position LIMIT ?', (job_id, FAILED, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_checkpoint(self, job_id: str, url: str, stage: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data FROM checkpoints WHERE job_id = ? AND url = ? AND stage = ?', (job_id, url, stage)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_checkpoint(self, job_id: str, url: str, stage: str, data: Dict):
+        """Сохранение результата этапа (до завершения анализа сайта)"""
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        now = datetime.now().isoformat()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO checkpoints (job_id, url, stage, data, created) VALUES (?, ?, ?, ?, ?)',
+                (job_id, url, stage, payload, now)
+            )
+            self._db.execute(
+                'UPDATE job_urls SET checkpoint = ?, updated = ? WHERE job_id = ? AND url = ?',
+                (stage, now, job_id, url)
+            )
+
+    def finish(self, job_id: str, result: Dict):
+        """
+        Запись итогового результата сайта
+
+        Контрольные точки удаляются только у успешно проанализированных
+        сайтов: неудачные при повторе продолжают с последнего этапа.
+        """
+        state = result_status(result)
+        now = datetime.now().isoformat()
+        url = result['url']
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE job_urls SET status = ?, error = ?, error_stage = ?, error_class = ?, '
+                'attempts = attempts + 1, updated = ?, result = ? WHERE job_id = ? AND url = ?',
+                (state['status'], state['error'], state['error_stage'], state['error_class'], now,
+                 json.dumps(result, ensure_ascii=False, separators=(',', ':')), job_id, url)
+            )
+            if state['status'] == DONE:
+                self._db.execute('DELETE FROM checkpoints WHERE job_id = ? AND url = ?', (job_id, url))
+                self._db.execute('UPDATE job_urls SET checkpoint = NULL WHERE job_id = ? AND url = ?', (job_id, url))
+            self._db.execute('UPDATE jobs SET updated = ? WHERE id = ?', (now, job_id))
+
+    def results(self, job_id: str) -> List[Dict]:
+        """Результаты всех завершенных URL задания в порядке исходного списка"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT result FROM job_urls WHERE job_id = ? AND result IS NOT NULL ORDER BY position', (job_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock, self._db:
+            return self._db.execute('DELETE FROM jobs WHERE id = ?', (job_id,)).rowcount > 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
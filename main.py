@@ -1,147 +1,401 @@
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
-import requests
-from bs4 import BeautifulSoup
-import google.generativeai as genai
-import os
-from typing import Optional, Dict
+# Тяжелые зависимости (google.generativeai, requests, lxml, asyncio, большая
+# часть rich) импортируются внутри команд и этапов, которые их используют,
+# чтобы version/config и обертки в пакетных запусках стартовали быстро
+from typing import Optional, Dict, List
 import json
 from rich.console import Console
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
-from rich.prompt import Prompt
-from rich.text import Text
-from rich import print as rprint
 import typer
-from rich.table import Table
 from datetime import datetime
-import ssl
-import socket
 import time
 from config import Config
+from tracing import Trace, StageProfiler, export_chrome_trace
 
 app = typer.Typer()
 console = Console()
+# Сообщения и сводка при выводе результатов в stdout (NDJSON)
+err_console = Console(stderr=True)
 
 VERSION = "1.2"
 
-# Инициализация конфигурации
-config_manager = Config()
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Конфигурация создается при первом обращении
+_config_manager: Optional[Config] = None
+
+def get_config() -> Config:
+    """Получение (и при первом вызове загрузка) конфигурации"""
+    global _config_manager
+    if _config_manager is None:
+        _config_manager = Config()
+    return _config_manager
+
+def open_job_queue(required: bool = False):
+    """Очередь пакетных заданий или None, если она отключена в конфигурации"""
+    from jobs import JobQueue
+    
+    settings = get_config().get_jobs_settings()
+    if not settings['enabled'] and not required:
+        return None
+    return JobQueue(settings['path'] or None)
+
+def open_result_store(required: bool = False):
+    """База результатов анализа или None, если она отключена в конфигурации"""
+    from results_store import ResultStore
+    
+    settings = get_config().get_results_settings()
+    if not settings['enabled'] and not required:
+        return None
+    return ResultStore(settings['path'] or None)
 
 class ParsLinkAI:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True, require_model: bool = True, model=None,
+                 gemini_settings: Optional[Dict] = None):
         """
         Инициализация парсера с конфигурацией
+        
+        При require_model=False парсер создается и без API ключа
+        (для обхода сайта без анализа через Gemini). Через model можно
+        передать готовую модель, например scheduler.StubModel для тестов.
         """
+        from transport import HttpTransport
+        from scheduler import GeminiScheduler
+        from tls_scanner import TlsScanner
+        from cache import AnalysisCache
+        from page_store import PageStore
+        from extractor import resolve_backend
+        
+        config_manager = get_config()
         self.api_key = config_manager.get_api_key()
-        if not self.api_key:
+        self.model_name = config_manager.get_model()
+        self.model = model
+        if self.model is None and self.api_key:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self.model = genai.GenerativeModel(self.model_name)
+        elif self.model is None and require_model:
             raise ValueError("API ключ не найден. Используйте команду 'config' для настройки.")
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(config_manager.get_model())
+        cache_settings = config_manager.get_cache_settings()
+        self.cache = None
+        if use_cache and cache_settings['enabled']:
+            self.cache = AnalysisCache(
+                ttl=cache_settings['ttl'],
+                max_size=int(cache_settings['max_size_mb'] * 1024 * 1024)
+            )
+        self.page_store = PageStore() if use_cache and cache_settings['pages'] else None
+        
+        settings = config_manager.get_gemini_settings()
+        settings.update(gemini_settings or {})
+        self.scheduler = GeminiScheduler(self.model, **settings) if self.model is not None else None
+        
+        self.html_backend = resolve_backend(config_manager.get_html_backend())
+        self.prompt_tokens = config_manager.get_prompt_settings()['max_tokens']
+        
+        tls_settings = config_manager.get_tls_settings()
+        self.tls_scanner = TlsScanner(
+            timeout=tls_settings['timeout'],
+            concurrency=tls_settings['concurrency'],
+            ttl=tls_settings['ttl'],
+            max_entries=tls_settings['max_entries']
+        )
+        
+        http_settings = config_manager.get_http_settings()
+        self.transport = HttpTransport(
+            pool_connections=http_settings['pool_connections'],
+            pool_maxsize=http_settings['pool_maxsize'],
+            retries=http_settings['retries'],
+            backoff_factor=http_settings['backoff_factor'],
+            http2=http_settings['http2'],
+            headers=DEFAULT_HEADERS,
+            max_bytes=http_settings['max_bytes'],
+            max_ratio=http_settings['max_decompression_ratio']
+        )
+        self._resource_analyzer = None
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """
+        Добавление схемы к URL, если она не указана
+        """
+        url = url.strip()
+        if not url.startswith('http://') and not url.startswith('https://'):
+            url = 'https://' + url
+        return url
 
-    def analyze_performance(self, soup, response):
+    def analyze_performance(self, extracted: Dict, response):
         """
         Анализ производительности сайта
         """
-        performance = {
-            'page_size': len(response.content) / 1024,  # размер в КБ
-            'scripts_count': len(soup.find_all('script')),
-            'styles_count': len(soup.find_all('link', rel='stylesheet')),
-            'images': []
-        }
+        from analyzers import analyze_performance, response_meta
         
-        # Анализ изображений
-        for img in soup.find_all('img'):
-            img_data = {
-                'src': img.get('src', ''),
-                'alt': img.get('alt', ''),
-                'has_alt': bool(img.get('alt')),
-            }
-            performance['images'].append(img_data)
-            
-        return performance
+        return analyze_performance(extracted, response_meta(response))
         
-    def analyze_seo(self, soup, url):
+    def analyze_seo(self, extracted: Dict, url, site_files=None):
         """
         Расширенный SEO-анализ
         """
-        seo_data = {
-            'headings': {},
-            'links': {'internal': [], 'external': []},
-            'meta_tags': {},
-            'sitemap': None,
-            'robots': None
-        }
+        from analyzers import analyze_seo
         
-        # Анализ заголовков
-        for i in range(1, 7):
-            seo_data['headings'][f'h{i}'] = len(soup.find_all(f'h{i}'))
-            
-        # Анализ ссылок
-        domain = url.split('//')[1].split('/')[0]
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if href:
-                if domain in href or href.startswith('/'):
-                    seo_data['links']['internal'].append(href)
-                else:
-                    seo_data['links']['external'].append(href)
-                    
         # Проверка sitemap и robots
+        if site_files is None:
+            site_files = self.fetch_site_files(url)
+        return analyze_seo(extracted, url, site_files)
+        
+    def analyze_security(self, response):
+        """
+        Расширенный анализ безопасности
+        """
+        from analyzers import analyze_security, response_meta
+        
+        return analyze_security(response_meta(response))
+
+    def check_ssl(self, url: str, response=None, timeout: Optional[float] = None,
+                  trace: Optional[Trace] = None) -> Dict:
+        """
+        Проверка SSL сертификата сайта
+        """
+        # Сертификат из соединения, через которое уже загружена страница
+        tls_info = getattr(response, 'tls_info', None)
+        if tls_info:
+            return tls_info
+        
+        # Иначе отдельный handshake (результат кэшируется по host:port)
+        host, port = self.tls_target(url)
+        with (trace or Trace()).span('ssl'):
+            return self.tls_scanner.scan_sync(host, port, timeout=timeout)
+
+    @staticmethod
+    def tls_target(url: str):
+        """Хост и порт для проверки сертификата сайта"""
+        from urllib.parse import urlsplit
+        
+        parts = urlsplit(url)
+        port = parts.port if parts.scheme == 'https' and parts.port else 443
+        return parts.hostname, port
+
+    def fetch_page(self, url: str, timeout: float = 30, trace: Optional[Trace] = None, parse: bool = True):
+        """
+        Загрузка HTML страницы (условный запрос, если страница уже сохранена)
+        
+        При parse=True страница разбирается во время загрузки, иначе
+        разбор выполняет вызывающий (например, пул процессов в analyze-many).
+        """
+        trace = trace or Trace()
+        headers = self.page_store.conditional_headers(url) if self.page_store else {}
+        sink = self._page_sink if parse else None
+        span = {'url': url}
+        fetch_start = start = time.perf_counter()
+        response = None
         try:
-            robots_resp = requests.get(f"{url.rstrip('/')}/robots.txt", timeout=5)
+            response = self.transport.fetch(url, timeout=timeout, headers=headers, sink=sink)
+            if response.status_code == 304 and self.page_store and not self.page_store.has_page(url):
+                # Сохраненная запись повреждена: загружаем страницу целиком
+                self.page_store.discard(url)
+                start = time.perf_counter()
+                response = self.transport.fetch(url, timeout=timeout, sink=sink)
+            span['status'] = response.status_code
+            span['truncated'] = response.truncated
+        finally:
+            # Потоковый разбор шел внутри загрузки: его время входит в этап parse, а не fetch
+            streamed = getattr(response, 'sink_time', 0.0)
+            trace.add('fetch', fetch_start, max(0.0, time.perf_counter() - fetch_start - streamed), **span)
+        trace.add_network(response.timings, start)
+        
+        extractor = getattr(response, 'extractor', None)
+        if extractor is not None:
+            parse_start = time.perf_counter()
+            response.extracted = extractor.close()
+            response.encoding = extractor.encoding
+            # Разбор шел во время загрузки: в трассу попадает его суммарное время
+            response.parse_time += time.perf_counter() - parse_start
+            trace.add('parse', parse_start, response.parse_time, backend=self.html_backend, streamed=True)
+        if response.status_code == 304 and not (self.page_store and self.page_store.has_page(url)):
+            # 304 без условного запроса (или без сохраненных метрик) — обычная ошибка ответа
+            from requests import HTTPError
+            
+            raise HTTPError(f"304 Not Modified без сохраненной страницы: {url}", response=response)
+        response.raise_for_status()
+        return response
+
+    def _page_sink(self, response):
+        """
+        Потоковый парсер для HTML-страницы: блоки разбираются по мере загрузки
+        """
+        content_type = response.headers.get('Content-Type', 'text/html').lower()
+        if response.status_code != 200 or 'html' not in content_type:
+            return None
+        
+        from extractor import PageExtractor, content_type_charset
+        
+        extractor = PageExtractor(self.html_backend, encoding=content_type_charset(content_type))
+        response.extractor = extractor
+        response.parse_time = 0.0
+        
+        def feed(chunk: bytes):
+            start = time.perf_counter()
+            extractor.feed_bytes(chunk)
+            response.parse_time += time.perf_counter() - start
+        return feed
+
+    def fetch_site_files(self, url: str, timeout: float = 5, trace: Optional[Trace] = None) -> Dict:
+        """
+        Загрузка robots.txt и проверка наличия sitemap.xml
+        """
+        site_files = {'robots': None, 'sitemap': None}
+        with (trace or Trace()).span('site_files'):
+            self._fetch_site_files(url, timeout, site_files)
+        return site_files
+
+    def _fetch_site_files(self, url: str, timeout: float, site_files: Dict):
+        try:
+            robots_resp = self.transport.get(f"{url.rstrip('/')}/robots.txt", timeout=timeout)
             if robots_resp.status_code == 200:
-                seo_data['robots'] = robots_resp.text
+                site_files['robots'] = robots_resp.text
                 
-            sitemap_resp = requests.get(f"{url.rstrip('/')}/sitemap.xml", timeout=5)
+            sitemap_resp = self.transport.get(f"{url.rstrip('/')}/sitemap.xml", timeout=timeout)
             if sitemap_resp.status_code == 200:
-                seo_data['sitemap'] = True
+                site_files['sitemap'] = True
         except:
             pass
+
+    def analyze_page(self, url: str, response, site_files: Optional[Dict] = None,
+                     trace: Optional[Trace] = None) -> Dict:
+        """
+        Парсинг HTML и запуск всех анализаторов страницы
+        """
+        trace = trace or Trace()
+        if response.status_code == 304:
+            # Страница не изменилась: используем сохраненные метрики без разбора
+            page = self.page_store.load_page(url)
+            if site_files is None:
+                site_files = self.fetch_site_files(url, trace=trace)
+            page['seo']['robots'] = site_files.get('robots')
+            page['seo']['sitemap'] = site_files.get('sitemap')
+            page['not_modified'] = True
+            return page
+        
+        from analyzers import build_page, response_meta
+        
+        # Все метрики собираются за один проход по документу,
+        # обычно еще во время загрузки (см. fetch_page)
+        extracted = getattr(response, 'extracted', None)
+        if extracted is None:
+            from extractor import extract_page
             
-        return seo_data
+            with trace.span('parse', backend=self.html_backend):
+                extracted = extract_page(response.text, self.html_backend)
+        if site_files is None:
+            site_files = self.fetch_site_files(url, trace=trace)
         
-    def analyze_security(self, response):
+        page = build_page(extracted, url, response_meta(response), site_files, trace)
+        self.store_page(url, response, page)
+        return page
+
+    def store_page(self, url: str, response, page: Dict):
         """
-        Расширенный анализ безопасности
+        Сохранение страницы и метрик для последующих условных запросов
         """
-        security = {
-            'headers': {
-                'HSTS': response.headers.get('Strict-Transport-Security'),
-                'CSP': response.headers.get('Content-Security-Policy'),
-                'X-Frame-Options': response.headers.get('X-Frame-Options'),
-                'X-XSS-Protection': response.headers.get('X-XSS-Protection')
-            },
-            'cookies': {str(cookie): response.cookies[cookie] for cookie in response.cookies},
+        if self.page_store:
+            self.page_store.save(url, response, page)
+
+    def analyze_resources(self, url: str, page: Dict, trace: Optional[Trace] = None) -> Dict:
+        """
+        Вес ресурсов страницы (режим --deep)
+        
+        Отчет сохраняется в page['performance']['resources'].
+        """
+        if self._resource_analyzer is None:
+            from resources import ResourceAnalyzer
+            
+            self._resource_analyzer = ResourceAnalyzer(self.transport, **get_config().get_resources_settings())
+        with (trace or Trace()).span('resources') as span:
+            report = self._resource_analyzer.analyze(url, page['performance'])
+            span['assets'] = report['checked']
+        page['performance']['resources'] = report
+        return report
+
+    def build_prompt(self, url: str, page: Dict) -> str:
+        """
+        Формирование промпта для Gemini в пределах бюджета токенов (prompt.max_tokens)
+        """
+        from prompt import build_prompt
+
+        return build_prompt(url, page, max_tokens=self.prompt_tokens)
+
+    def _cached_analysis(self, prompt: str) -> Optional[str]:
+        return self.cache.get(prompt, self.model_name) if self.cache else None
+
+    def generate_analysis(self, prompt: str, trace: Optional[Trace] = None) -> str:
+        """
+        Получение анализа от Gemini (с учетом кэша, бюджета запросов и повторов)
+        """
+        with (trace or Trace()).span('gemini', model=self.model_name) as span:
+            analysis = self._cached_analysis(prompt)
+            span['cached'] = analysis is not None
+            if analysis is not None:
+                return analysis
+            analysis = self.scheduler.generate_sync(prompt)
+        if self.cache:
+            self.cache.set(prompt, self.model_name, analysis)
+        return analysis
+
+    async def generate_analysis_async(self, prompt: str, trace: Optional[Trace] = None) -> str:
+        """
+        Асинхронное получение анализа от Gemini для пакетных запусков
+        """
+        with (trace or Trace()).span('gemini', model=self.model_name) as span:
+            analysis = self._cached_analysis(prompt)
+            span['cached'] = analysis is not None
+            if analysis is not None:
+                return analysis
+            analysis = await self.scheduler.generate(prompt)
+        if self.cache:
+            self.cache.set(prompt, self.model_name, analysis)
+        return analysis
+
+    def build_result(self, url: str, page: Dict, analysis: Optional[str], ssl_info: Dict, load_time: float,
+                     trace: Optional[Trace] = None, analysis_error: Optional[str] = None) -> Dict:
+        """
+        Формирование итогового результата анализа
+        
+        Если Gemini не ответил, результат сохраняет собранные метрики,
+        analysis равен None, а причина записывается в analysis_error.
+        """
+        result = {
+            "url": url,
+            "title": page['title'],
+            "description": page['description'],
+            "analysis": analysis,
+            "timestamp": datetime.now().isoformat(),
+            "model": self.model_name,
+            "performance": page['performance'],
+            "seo": page['seo'],
+            "security": page['security'],
+            "ssl_info": ssl_info,
+            "load_time": load_time,
+            "not_modified": page.get('not_modified', False),
+            "timings": trace.timings() if trace else {}
         }
-        return security
+        if analysis_error is not None:
+            result["analysis_error"] = analysis_error
+        return result
 
-    def parse_website(self, url: str) -> Optional[Dict]:
+    def parse_website(self, url: str, trace: Optional[Trace] = None, deep: bool = False) -> Optional[Dict]:
         """
         Парсинг веб-сайта и анализ через Gemini API
+        
+        При deep=True дополнительно измеряется вес скриптов, стилей и изображений.
         """
+        from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+        
         try:
-            start_time = time.time()
-            
-            # Проверка SSL
-            ssl_info = {'valid': False}
-            try:
-                hostname = url.split('//')[1].split('/')[0]
-                context = ssl.create_default_context()
-                with socket.create_connection((hostname, 443)) as sock:
-                    with context.wrap_socket(sock, server_hostname=hostname) as ssock:
-                        cert = ssock.getpeercert()
-                        ssl_info['valid'] = True
-                        ssl_info['issuer'] = dict(x[0] for x in cert['issuer'])
-                        ssl_info['expires'] = cert['notAfter']
-                        ssl_info['version'] = ssock.version()
-                        ssl_info['cipher'] = ssock.cipher()
-            except Exception as e:
-                ssl_info['error'] = str(e)
-            
-            load_time = time.time() - start_time
+            url = self.normalize_url(url)
+            trace = trace or Trace(url)
             
             with Progress(
                 SpinnerColumn(spinner_name='dots', style='blue'),
@@ -152,91 +406,38 @@ class ParsLinkAI:
             ) as progress:
                 # Получаем содержимое сайта
                 fetch_task = progress.add_task("[cyan]Загрузка сайта...", total=100)
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                if not url.startswith('http://') and not url.startswith('https://'):
-                    url = 'https://' + url
-                response = requests.get(url, headers=headers, timeout=30)
-                response.raise_for_status()
+                response = self.fetch_page(url, trace=trace)
+                load_time = trace.total('fetch')
+                site_files = self.fetch_site_files(url, trace=trace)
                 progress.update(fetch_task, advance=50)
                 
-                # Парсим HTML
-                parse_task = progress.add_task("[green]Парсинг содержимого...", total=100)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                progress.update(parse_task, advance=50)
-                
-                # Анализ производительности
-                perf_task = progress.add_task("[yellow]Анализ производительности...", total=100)
-                performance_data = self.analyze_performance(soup, response)
-                progress.update(perf_task, advance=100)
-                
-                # SEO анализ
-                seo_task = progress.add_task("[blue]SEO анализ...", total=100)
-                seo_data = self.analyze_seo(soup, url)
-                progress.update(seo_task, advance=100)
+                # Проверка SSL
+                ssl_info = self.check_ssl(url, response, trace=trace)
                 
-                # Анализ безопасности
-                security_task = progress.add_task("[red]Анализ безопасности...", total=100)
-                security_data = self.analyze_security(response)
-                progress.update(security_task, advance=100)
+                # Парсим HTML и анализируем страницу
+                parse_task = progress.add_task("[green]Парсинг и анализ содержимого...", total=100)
+                page = self.analyze_page(url, response, site_files, trace=trace)
+                progress.update(parse_task, advance=100)
                 
-                # Основная информация
-                title = soup.title.string if soup.title else "Заголовок не найден"
-                meta_description = soup.find('meta', {'name': 'description'})
-                description = meta_description['content'] if meta_description else "Описание не найдено"
-                
-                # Получаем текст из основного контента
-                main_content = ' '.join([p.text for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'article'])])
-                
-                # Формируем промпт для Gemini
-                analysis_task = progress.add_task("[magenta]Анализ через Gemini AI...", total=100)
-                prompt = f"""
-                Проанализируй следующий веб-сайт и предоставь подробную информацию:
-                URL: {url}
-                Заголовок: {title}
-                Описание: {description}
-                Основной контент: {main_content[:1000]}...
-                
-                Производительность:
-                - Размер страницы: {performance_data['page_size']:.2f} КБ
-                - Количество скриптов: {performance_data['scripts_count']}
-                - Количество стилей: {performance_data['styles_count']}
-                
-                SEO данные:
-                - Структура заголовков: {seo_data['headings']}
-                - Внутренние ссылки: {len(seo_data['links']['internal'])}
-                - Внешние ссылки: {len(seo_data['links']['external'])}
-                
-                Пожалуйста, предоставь структурированный анализ, включающий:
-                1. Основную тему и назначение сайта
-                2. Ключевые темы и разделы
-                3. Целевую аудиторию
-                4. Качество и актуальность контента
-                5. Рекомендации по улучшению производительности и SEO
-                6. Оценку безопасности
-                """
+                if deep:
+                    resources_task = progress.add_task("[yellow]Проверка ресурсов страницы...", total=100)
+                    self.analyze_resources(url, page, trace)
+                    progress.update(resources_task, advance=100)
                 
                 # Получаем анализ от Gemini
-                response_ai = self.model.generate_content(prompt)
+                analysis_task = progress.add_task("[magenta]Анализ через Gemini AI...", total=100)
+                with trace.span('prompt'):
+                    prompt = self.build_prompt(url, page)
+                analysis, analysis_error = None, None
+                try:
+                    analysis = self.generate_analysis(prompt, trace=trace)
+                except Exception as e:
+                    # Метрики уже собраны: не теряем их из-за ошибки Gemini
+                    analysis_error = str(e)
+                    console.print(f"[yellow]Gemini не вернул анализ: {analysis_error}[/yellow]")
                 progress.update(analysis_task, advance=100)
                 
-                # Формируем результат
-                result = {
-                    "url": url,
-                    "title": title,
-                    "description": description,
-                    "analysis": response_ai.text,
-                    "timestamp": datetime.now().isoformat(),
-                    "model": config_manager.get_model(),
-                    "performance": performance_data,
-                    "seo": seo_data,
-                    "security": security_data,
-                    "ssl_info": ssl_info,
-                    "load_time": load_time
-                }
-                
-                return result
+                return self.build_result(url, page, analysis, ssl_info, load_time, trace, analysis_error)
                 
         except Exception as e:
             console.print(f"[red]Ошибка при парсинге сайта {url}: {str(e)}")
@@ -244,6 +445,9 @@ class ParsLinkAI:
 
 def display_results(result: Dict):
     """Отображение результатов анализа"""
+    from rich.panel import Panel
+    from rich.table import Table
+    
     if not result:
         return
 
@@ -257,7 +461,11 @@ def display_results(result: Dict):
     table.add_row("Описание", result['description'])
     table.add_row("Модель", result['model'])
     table.add_row("Время загрузки", f"{result['load_time']:.2f} сек")
-    table.add_row("Размер страницы", f"{result['performance']['page_size']:.2f} КБ")
+    table.add_row("Размер страницы", f"{result['performance']['page_size']:.2f} КБ"
+                  + (" (обрезана по лимиту)" if result['performance'].get('truncated') else ""))
+    if 'transfer_size' in result['performance']:
+        table.add_row("Передано по сети", f"{result['performance']['transfer_size']:.2f} КБ"
+                      + (f" ({result['performance']['content_encoding']})" if result['performance'].get('content_encoding') else ""))
     table.add_row("Скрипты/Стили", f"{result['performance']['scripts_count']}/{result['performance']['styles_count']}")
     table.add_row("SSL", "✅ Valid" if result['ssl_info']['valid'] else "❌ Invalid")
 
@@ -282,6 +490,13 @@ def display_results(result: Dict):
     console.print("\n")
     console.print(seo_table)
     
+    # Вес ресурсов (режим --deep)
+    resources = result['performance'].get('resources')
+    if resources and 'error' in resources:
+        console.print(f"\n[yellow]Вес ресурсов не измерен: {resources['error']}[/yellow]")
+    elif resources:
+        display_resources(resources)
+    
     # Безопасность
     security_table = Table(show_header=True, header_style="bold red", title="Анализ безопасности")
     security_table.add_column("Заголовок", style="cyan")
@@ -293,9 +508,62 @@ def display_results(result: Dict):
     console.print("\n")
     console.print(security_table)
     
+    # Время этапов
+    if result.get('timings'):
+        timings_table = Table(show_header=True, header_style="bold yellow", title="Время этапов")
+        timings_table.add_column("Этап", style="cyan")
+        timings_table.add_column("Время", style="green", justify="right")
+        for stage, duration in result['timings'].items():
+            timings_table.add_row(stage, f"{duration * 1000:.1f} мс")
+        console.print("\n")
+        console.print(timings_table)
+    
     # Отображаем анализ от Gemini
     console.print("\n[bold cyan]Анализ от Gemini AI:[/bold cyan]")
-    console.print(Panel(result['analysis'], border_style="cyan"))
+    if result['analysis'] is None:
+        console.print(Panel(f"Анализ не получен: {result.get('analysis_error', 'неизвестная ошибка')}", border_style="red"))
+    else:
+        console.print(Panel(result['analysis'], border_style="cyan"))
+
+def display_resources(resources: Dict):
+    """Отчет о весе ресурсов страницы"""
+    from rich.table import Table
+    from rich.markup import escape
+    
+    weight_table = Table(show_header=True, header_style="bold yellow", title="Вес страницы")
+    weight_table.add_column("Параметр", style="cyan")
+    weight_table.add_column("Значение", style="green")
+    weight_table.add_row("Общий вес", f"{resources['total_weight']:.2f} КБ")
+    weight_table.add_row("Ресурсы", f"{resources['assets_weight']:.2f} КБ ({resources['assets_count']} шт.)")
+    for kind, entry in resources['by_type'].items():
+        weight_table.add_row(f"  {kind}", f"{entry['size']:.2f} КБ ({entry['count']} шт.)")
+    if resources['unknown_size']:
+        weight_table.add_row("Размер неизвестен", str(resources['unknown_size']))
+    weight_table.add_row("Без сжатия", str(len(resources['uncompressed'])))
+    weight_table.add_row("Без кэширования", str(len(resources['uncached'])))
+    if resources['errors']:
+        weight_table.add_row("Ошибки загрузки", str(len(resources['errors'])))
+    console.print("\n")
+    console.print(weight_table)
+    
+    if resources['largest']:
+        largest_table = Table(show_header=True, header_style="bold yellow", title="Самые тяжелые ресурсы")
+        largest_table.add_column("Ресурс", style="cyan", overflow="fold")
+        largest_table.add_column("Тип")
+        largest_table.add_column("Размер", style="green", justify="right")
+        for asset in resources['largest']:
+            largest_table.add_row(escape(asset['url']), asset['type'], f"{asset['size']:.2f} КБ")
+        console.print(largest_table)
+    
+    problems = [(asset, "без сжатия") for asset in resources['uncompressed']]
+    problems += [(asset, f"без кэширования ({asset['cache_control'] or 'нет заголовков'})") for asset in resources['uncached']]
+    if problems:
+        problems_table = Table(show_header=True, header_style="bold red", title="Проблемы кэширования и сжатия")
+        problems_table.add_column("Ресурс", style="cyan", overflow="fold")
+        problems_table.add_column("Проблема", style="red")
+        for asset, problem in problems:
+            problems_table.add_row(escape(asset['url']), escape(problem))
+        console.print(problems_table)
 
 def save_html_report(result: Dict, filename: str):
     ssl_status = '✅ Valid' if result['ssl_info']['valid'] else f'❌ Invalid ({result["ssl_info"].get("error", "Unknown error")})'
@@ -331,17 +599,51 @@ def config():
     """
     Настройка конфигурации ParsLinkAI
     """
-    config_manager.setup()
+    get_config().setup()
+
+@app.command()
+def cache(
+    clear: bool = typer.Option(False, "--clear", help="Удалить все записи кэша")
+):
+    """
+    Статистика и очистка кэша анализов Gemini
+    """
+    from rich.table import Table
+    from cache import AnalysisCache
+    
+    settings = get_config().get_cache_settings()
+    analysis_cache = AnalysisCache(ttl=settings['ttl'], max_size=int(settings['max_size_mb'] * 1024 * 1024))
+    if clear:
+        analysis_cache.clear()
+        console.print("[green]Кэш очищен[/green]")
+        return
+    
+    stats = analysis_cache.stats()
+    table = Table(show_header=True, header_style="bold magenta", title="Кэш анализов Gemini")
+    table.add_column("Параметр", style="cyan")
+    table.add_column("Значение", style="green")
+    table.add_row("Каталог", stats['directory'])
+    table.add_row("Записей", str(stats['entries']))
+    table.add_row("Размер", f"{stats['size'] / 1024:.2f} КБ из {settings['max_size_mb']} МБ")
+    table.add_row("TTL", f"{settings['ttl'] / 3600:.0f} ч")
+    table.add_row("Включен", "✅" if settings['enabled'] else "❌")
+    console.print(table)
 
 @app.command()
 def analyze(
     url: str = typer.Argument(..., help="URL сайта для анализа"),
     output: str = typer.Option(None, "--output", "-o", help="Путь для сохранения результатов в JSON"),
-    html_output: str = typer.Option(None, "--html-output", "-ho", help="Путь для сохранения отчета в HTML")
+    html_output: str = typer.Option(None, "--html-output", "-ho", help="Путь для сохранения отчета в HTML"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать кэш анализов Gemini и сохраненные страницы"),
+    trace_output: str = typer.Option(None, "--trace", help="Путь для сохранения трассы этапов (Chrome Trace Event JSON)"),
+    profile_output: str = typer.Option(None, "--profile", help="Путь для сохранения статистики cProfile"),
+    deep: bool = typer.Option(False, "--deep", help="Измерить вес скриптов, стилей и изображений (HEAD/Range-запросы)")
 ):
     """
     Анализ веб-сайта с помощью ParsLinkAI
     """
+    from rich.panel import Panel
+    
     # Создаем заголовок
     console.print(Panel.fit(
         "[bold cyan]ParsLinkAI[/bold cyan] - [green]Умный анализатор веб-сайтов[/green]",
@@ -349,12 +651,29 @@ def analyze(
     ))
     
     try:
-        parser = ParsLinkAI()
-        result = parser.parse_website(url)
+        parser = ParsLinkAI(use_cache=not no_cache)
+        trace = Trace(parser.normalize_url(url))
+        profiler = StageProfiler() if profile_output else None
+        if profiler:
+            result = profiler.run(parser.parse_website, url, trace, deep)
+        else:
+            result = parser.parse_website(url, trace, deep)
+        
+        if trace_output:
+            export_chrome_trace([trace], trace_output)
+            console.print(f"\n[green]Трасса сохранена в файл: {trace_output}[/green]")
+        if profiler:
+            profiler.dump(profile_output)
+            console.print(f"[green]Профиль сохранен в файл: {profile_output} (python -m pstats {profile_output})[/green]")
         
         if result:
             display_results(result)
             
+            store = open_result_store()
+            if store:
+                store.add(result)
+                store.close()
+            
             # Сохраняем результат в файл, если указан путь
             if output:
                 with open(output, 'w', encoding='utf-8') as f:
@@ -369,5 +688,628 @@ def analyze(
         console.print(f"[red]{str(e)}[/red]")
         raise typer.Exit(1)
 
+def parse_stage_timeouts(values: List[str]) -> Dict[str, float]:
+    """Разбор параметров вида этап=секунды"""
+    from batch import DEFAULT_STAGE_TIMEOUTS
+    
+    timeouts = {}
+    for value in values or []:
+        stage, sep, seconds = value.partition('=')
+        if not sep or stage not in DEFAULT_STAGE_TIMEOUTS:
+            raise typer.BadParameter(
+                f"Ожидается формат этап=секунды, этапы: {', '.join(DEFAULT_STAGE_TIMEOUTS)}"
+            )
+        try:
+            timeouts[stage] = float(seconds)
+        except ValueError:
+            raise typer.BadParameter(f"Некорректный таймаут: {value}")
+    return timeouts
+
+def display_batch_summary(report: Dict, out: Optional[Console] = None):
+    """Отображение сводки пакетного анализа"""
+    from rich.table import Table
+    
+    out = out or console
+    summary = report['summary']
+    table = Table(show_header=True, header_style="bold magenta", title="Пакетный анализ")
+    table.add_column("URL", style="cyan")
+    table.add_column("Статус", style="green")
+    
+    for result in report['results']:
+        if result.get('analysis_error'):
+            table.add_row(result['url'], f"⚠️ {result['title'] or ''} (без анализа Gemini: {result['analysis_error']})")
+        else:
+            table.add_row(result['url'], "✅ " + (result['title'] or ''))
+    for error in report['errors']:
+        table.add_row(error['url'], f"❌ [{error['stage']}/{error.get('error_class', 'other')}] {error['error']}")
+    
+    out.print("\n")
+    out.print(table)
+    out.print(
+        f"\n[bold]Всего:[/bold] {summary['total']}  "
+        f"[green]Успешно:[/green] {summary['succeeded']}  "
+        f"[yellow]Без анализа:[/yellow] {summary.get('ai_failed', 0)}  "
+        f"[red]Ошибок:[/red] {summary['failed']}  "
+        f"[cyan]Время:[/cyan] {summary['elapsed']:.2f} сек"
+    )
+    if summary.get('gemini'):
+        gemini = summary['gemini']
+        out.print(
+            f"[bold]Gemini:[/bold] запросов {gemini['requests']}, повторов {gemini['retries']}, "
+            f"объединенных запросов {gemini['packed_requests']} ({gemini['packed_sites']} сайтов)"
+        )
+    if 'cache' in summary:
+        out.print(
+            f"[bold]Кэш Gemini:[/bold] попаданий {summary['cache']['hits']}, "
+            f"промахов {summary['cache']['misses']}"
+        )
+    if summary.get('stage_totals'):
+        stages = ', '.join(
+            f"{stage} {duration:.2f}" for stage, duration in
+            sorted(summary['stage_totals'].items(), key=lambda item: item[1], reverse=True)
+        )
+        out.print(f"[bold]Суммарное время этапов (сек):[/bold] {stages}")
+    if summary.get('job'):
+        classes = ', '.join(f"{name} {count}" for name, count in summary['error_classes'].items())
+        out.print(
+            f"[bold]Задание:[/bold] {summary['job']}, обработано в этом запуске {summary['processed']}, "
+            f"не обработано {summary['pending']}" + (f", ошибки по классам: {classes}" if classes else "")
+        )
+        if summary['pending']:
+            out.print(f"Продолжить: python main.py analyze-many --resume {summary['job']}")
+        if classes:
+            out.print(f"Повторить неудачные: python main.py analyze-many --resume {summary['job']} --retry-failed")
+
+@app.command("analyze-many")
+def analyze_many(
+    source: str = typer.Argument(None, help="Файл со списком URL (по одному в строке) или '-' для stdin"),
+    output: str = typer.Option(None, "--output", "-o", help="Путь для сохранения сводных результатов в JSON"),
+    concurrency: int = typer.Option(10, "--concurrency", "-c", help="Максимум одновременно анализируемых сайтов"),
+    per_host: int = typer.Option(2, "--per-host", help="Максимум одновременно анализируемых сайтов одного хоста"),
+    timeout: List[str] = typer.Option(None, "--timeout", "-t", help="Таймаут этапа в формате этап=секунды (ssl, fetch, site_files, parse, resources, ai)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать кэш анализов Gemini и сохраненные страницы"),
+    trace_output: str = typer.Option(None, "--trace", help="Путь для сохранения трассы этапов (Chrome Trace Event JSON)"),
+    profile_output: str = typer.Option(None, "--profile", help="Путь для сохранения статистики cProfile по всем потокам"),
+    parse_workers: int = typer.Option(None, "--parse-workers", help="Число процессов для разбора HTML (по умолчанию по числу ядер, 0 — разбор в потоках)"),
+    pack: int = typer.Option(None, "--pack", help="Объединять до N небольших сайтов в один запрос к Gemini"),
+    rpm: float = typer.Option(None, "--rpm", help="Лимит запросов к Gemini в минуту"),
+    tpm: float = typer.Option(None, "--tpm", help="Лимит токенов Gemini в минуту"),
+    deep: bool = typer.Option(False, "--deep", help="Измерить вес скриптов, стилей и изображений каждого сайта"),
+    ndjson: bool = typer.Option(False, "--ndjson", help="Выводить результат каждого сайта в stdout строкой JSON сразу по готовности"),
+    job_id: str = typer.Option(None, "--job", help="Имя нового задания (по умолчанию — дата и время запуска)"),
+    resume: str = typer.Option(None, "--resume", help="Продолжить задание: необработанные или прерванные URL"),
+    retry_failed: bool = typer.Option(False, "--retry-failed", help="С --resume: повторить только URL, завершившиеся ошибкой"),
+    error_class: List[str] = typer.Option(None, "--error-class", help="С --retry-failed: только ошибки класса (timeout, quota, server, http, network, limit, other)")
+):
+    """
+    Пакетный анализ списка сайтов с ограничением конкурентности
+    
+    Каждый запуск записывается как задание в ~/.parslinkai/jobs.db: после
+    сбоя или Ctrl+C его можно продолжить (--resume) или повторить только
+    неудачные URL (--retry-failed) без повторной загрузки уже разобранных страниц.
+    """
+    from batch import BatchAnalyzer, read_urls, url_problem
+    
+    # При потоковом выводе stdout содержит только строки NDJSON
+    out = err_console if ndjson else console
+    if (retry_failed or error_class) and not resume:
+        raise typer.BadParameter("--retry-failed и --error-class используются вместе с --resume")
+    if resume and (source or job_id):
+        raise typer.BadParameter("При --resume список URL берется из задания")
+    if not resume and not source:
+        raise typer.BadParameter("Укажите файл со списком URL или задание (--resume)")
+    
+    jobs = open_job_queue(required=bool(resume or job_id))
+    if resume:
+        job = jobs.get(resume)
+        if job is None:
+            out.print(f"[red]Задание не найдено: {resume}[/red]")
+            raise typer.Exit(1)
+        urls = jobs.urls(resume, retry_failed=retry_failed, error_classes=error_class)
+        deep = deep or job['options'].get('deep', False)
+        job_id = resume
+        if not urls:
+            out.print(f"[yellow]В задании {resume} нет URL для обработки[/yellow] "
+                      f"(готово {job['counts']['done']}, с ошибкой {job['counts']['failed']})")
+            jobs.close()
+            return
+    else:
+        try:
+            urls = read_urls(source)
+        except OSError as e:
+            out.print(f"[red]Не удалось прочитать список URL: {str(e)}[/red]")
+            raise typer.Exit(1)
+        urls = list(dict.fromkeys(ParsLinkAI.normalize_url(url) for url in urls))
+        problems = {url: url_problem(url) for url in urls}
+        for url, problem in problems.items():
+            if problem:
+                out.print(f"[yellow]Пропущен {url}: {problem}[/yellow]")
+        urls = [url for url in urls if not problems[url]]
+        if not urls:
+            out.print("[yellow]Список URL пуст[/yellow]")
+            raise typer.Exit(1)
+        if jobs:
+            try:
+                job_id = jobs.create(urls, {'deep': deep}, source=source, job_id=job_id)
+            except ValueError as e:
+                out.print(f"[red]{str(e)}[/red]")
+                raise typer.Exit(1)
+    
+    gemini_settings = {
+        key: value for key, value in (('pack_sites', pack), ('rpm', rpm), ('tpm', tpm))
+        if value is not None
+    }
+    try:
+        parser = ParsLinkAI(use_cache=not no_cache, gemini_settings=gemini_settings)
+    except ValueError as e:
+        out.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(1)
+    
+    if ndjson:
+        from service import ndjson_line
+    
+    def emit_ndjson(result: Dict):
+        sys.stdout.write(ndjson_line(result))
+        sys.stdout.flush()
+    
+    batch = BatchAnalyzer(
+        parser,
+        concurrency=concurrency,
+        per_host=per_host,
+        timeouts=parse_stage_timeouts(timeout),
+        profiler=StageProfiler() if profile_output else None,
+        parse_workers=parse_workers,
+        deep=deep,
+        on_result=emit_ndjson if ndjson else None,
+        jobs=jobs,
+        job_id=job_id
+    )
+    store = open_result_store()
+    try:
+        with out.status(f"[cyan]Анализ {len(urls)} сайтов..."):
+            report = batch.analyze(urls)
+    except KeyboardInterrupt:
+        # Завершенные сайты уже записаны в задание: сохраняем их и в базу результатов
+        if store:
+            store.add_many(batch.completed, run_id=datetime.now().isoformat())
+            store.close()
+        out.print(f"\n[yellow]Анализ прерван, обработано сайтов: {len(batch.completed)}[/yellow]")
+        if jobs:
+            jobs.close()
+            out.print(f"Продолжить: python main.py analyze-many --resume {job_id}")
+        raise typer.Exit(130)
+    if parser.cache:
+        report['summary']['cache'] = {'hits': parser.cache.hits, 'misses': parser.cache.misses}
+    
+    display_batch_summary(report, out)
+    
+    if store:
+        # В базу попадают только сайты этого запуска (при --resume отчет включает все задание)
+        store.add_many(batch.completed, run_id=report['timestamp'])
+        store.close()
+    if jobs:
+        jobs.close()
+    
+    if trace_output:
+        export_chrome_trace(batch.traces, trace_output)
+        out.print(f"\n[green]Трасса сохранена в файл: {trace_output}[/green]")
+    if batch.profiler:
+        batch.profiler.dump(profile_output)
+        out.print(f"[green]Профиль сохранен в файл: {profile_output} (python -m pstats {profile_output})[/green]")
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        out.print(f"\n[green]Результаты сохранены в файл: {output}[/green]")
+    
+    if report['summary']['succeeded'] == 0:
+        raise typer.Exit(1)
+
+@app.command("jobs")
+def jobs_command(
+    job_id: str = typer.Argument(None, help="Задание (без него — список последних заданий)"),
+    limit: int = typer.Option(20, "--limit", "-n", help="Максимум строк"),
+    delete: bool = typer.Option(False, "--delete", help="Удалить задание вместе с контрольными точками"),
+    as_json: bool = typer.Option(False, "--json", help="Вывести данные в JSON")
+):
+    """
+    Пакетные задания analyze-many: состояние, ошибки по классам, удаление
+    """
+    from rich.markup import escape
+    from rich.table import Table
+    
+    jobs = open_job_queue(required=True)
+    try:
+        if job_id is None:
+            rows = jobs.jobs(limit)
+            if as_json:
+                print(json.dumps(rows, ensure_ascii=False, indent=2))
+                return
+            table = Table(show_header=True, header_style="bold magenta", title="Задания")
+            table.add_column("Задание", style="cyan")
+            table.add_column("Создано")
+            table.add_column("Источник")
+            table.add_column("Всего", justify="right")
+            table.add_column("Готово", justify="right")
+            table.add_column("Ошибки", justify="right")
+            table.add_column("Осталось", justify="right")
+            for job in rows:
+                table.add_row(job['id'], job['created'][:19].replace('T', ' '), escape(job['source'] or ''),
+                              str(job['total']), str(job['counts']['done']), str(job['counts']['failed']),
+                              str(job['counts']['pending']))
+            console.print(table)
+            return
+        
+        job = jobs.get(job_id)
+        if job is None:
+            console.print(f"[red]Задание не найдено: {job_id}[/red]")
+            raise typer.Exit(1)
+        if delete:
+            jobs.delete(job_id)
+            console.print(f"[green]Задание {job_id} удалено[/green]")
+            return
+        failures = jobs.failures(job_id, limit)
+        classes = jobs.error_classes(job_id)
+        if as_json:
+            print(json.dumps(dict(job, error_classes=classes, failures=failures), ensure_ascii=False, indent=2))
+            return
+        console.print(
+            f"[bold]Задание {job_id}[/bold] ({escape(job['source'] or '')}, создано {job['created'][:19].replace('T', ' ')})\n"
+            f"Всего {job['total']}: готово {job['counts']['done']}, с ошибкой {job['counts']['failed']}, "
+            f"не обработано {job['counts']['pending']}"
+        )
+        if classes:
+            console.print("Ошибки по классам: " + ', '.join(f"{name} {count}" for name, count in classes.items()))
+        if failures:
+            table = Table(show_header=True, header_style="bold magenta", title="Неудачные URL")
+            table.add_column("URL", style="cyan")
+            table.add_column("Этап/класс")
+            table.add_column("Попыток", justify="right")
+            table.add_column("Контрольная точка")
+            table.add_column("Ошибка")
+            for failure in failures:
+                table.add_row(failure['url'], f"{failure['error_stage']}/{failure['error_class'] or 'other'}",
+                              str(failure['attempts']), failure['checkpoint'] or '—',
+                              escape((failure['error'] or '')[:80]))
+            console.print(table)
+    finally:
+        jobs.close()
+
+def _yes_no(value) -> str:
+    return '—' if value is None else ('✅' if value else '❌')
+
+@app.command()
+def history(
+    url: str = typer.Argument(None, help="URL сайта (без него — последние результаты всех сайтов)"),
+    limit: int = typer.Option(20, "--limit", "-n", help="Максимум строк"),
+    since: str = typer.Option(None, "--since", help="Начиная с момента: ISO-дата или 30m, 24h, 7d, 2w"),
+    latest: bool = typer.Option(False, "--latest", help="Только последний результат каждого сайта"),
+    missing: str = typer.Option(None, "--missing", help="Только сайты без заголовка (HSTS, CSP, X-Frame-Options, X-XSS-Protection)"),
+    expiring: int = typer.Option(None, "--expiring", help="Только сайты, сертификат которых истекает в течение N дней"),
+    as_json: bool = typer.Option(False, "--json", help="Вывести результаты в JSON")
+):
+    """
+    История результатов анализа из базы
+    """
+    from datetime import timedelta, timezone
+    from rich.markup import escape
+    from rich.table import Table
+    from results_store import HEADER_COLUMNS, parse_moment
+    
+    if missing and missing not in HEADER_COLUMNS:
+        raise typer.BadParameter(f"Доступные заголовки: {', '.join(HEADER_COLUMNS)}")
+    try:
+        since = parse_moment(since) if since else None
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    
+    store = open_result_store(required=True)
+    start = time.perf_counter()
+    if latest or missing or expiring is not None:
+        rows = sorted(store.latest(url=ParsLinkAI.normalize_url(url) if url else None).values(),
+                      key=lambda row: row['timestamp'], reverse=True)
+        if since:
+            rows = [row for row in rows if row['timestamp'] >= since]
+        if missing:
+            rows = [row for row in rows if row[HEADER_COLUMNS[missing]] == 0]
+        if expiring is not None:
+            border = (datetime.now(timezone.utc) + timedelta(days=expiring)).strftime('%Y-%m-%dT%H:%M:%S')
+            rows = [row for row in rows if row['ssl_expires'] and row['ssl_expires'] <= border]
+        rows = rows[:limit]
+    else:
+        rows = store.history(ParsLinkAI.normalize_url(url) if url else None, limit=limit, since=since)
+    elapsed = (time.perf_counter() - start) * 1000
+    store.close()
+    
+    if as_json:
+        print(json.dumps([{key: value for key, value in row.items() if key != 'data'} for row in rows],
+                         ensure_ascii=False, indent=2))
+        return
+    
+    table = Table(show_header=True, header_style="bold magenta", title="История анализа")
+    table.add_column("Время", style="cyan")
+    table.add_column("URL", style="cyan")
+    table.add_column("Размер", justify="right")
+    table.add_column("Загрузка", justify="right")
+    table.add_column("HSTS/CSP")
+    table.add_column("SSL до")
+    table.add_column("Статус")
+    for row in rows:
+        status = f"❌ {row['error_stage']}: {escape(row['error'][:80])}" if row['error'] else (
+            "⚠️ без анализа" if row['analysis_error'] else "✅")
+        table.add_row(
+            row['timestamp'][:19].replace('T', ' '),
+            row['url'],
+            f"{row['page_size']:.1f} КБ" if row['page_size'] is not None else '—',
+            f"{row['load_time']:.2f} сек" if row['load_time'] is not None else '—',
+            f"{_yes_no(row['has_hsts'])} / {_yes_no(row['has_csp'])}",
+            (row['ssl_expires'] or '—')[:10],
+            status
+        )
+    console.print(table)
+    console.print(f"[dim]Строк: {len(rows)}, запрос: {elapsed:.1f} мс[/dim]")
+
+@app.command()
+def diff(
+    url: str = typer.Argument(None, help="URL сайта (без него — все сайты, нужен --since)"),
+    since: str = typer.Option(None, "--since", help="Сравнить с состоянием на момент: ISO-дата или 30m, 24h, 7d, 2w"),
+    until: str = typer.Option(None, "--until", help="Конец периода (по умолчанию — последние результаты)"),
+    threshold: float = typer.Option(0.1, "--size-threshold", help="Минимальное относительное изменение размера страницы"),
+    field: str = typer.Option(None, "--field", help="Только изменения поля (например, HSTS, SSL, page_size)"),
+    as_json: bool = typer.Option(False, "--json", help="Вывести изменения в JSON")
+):
+    """
+    Изменения результатов анализа между двумя моментами времени
+    """
+    from rich.table import Table
+    from results_store import compare_rows, parse_moment
+    
+    if not url and not since:
+        raise typer.BadParameter("Для сравнения всех сайтов укажите --since")
+    try:
+        since = parse_moment(since) if since else None
+        until = parse_moment(until) if until else None
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    
+    store = open_result_store(required=True)
+    start = time.perf_counter()
+    if since:
+        changes = store.diff(since, until, ParsLinkAI.normalize_url(url) if url else None, threshold)
+    else:
+        # Без --since сравниваются два последних результата сайта
+        pair = store.previous_two(ParsLinkAI.normalize_url(url))
+        changes = []
+        if len(pair) == 2:
+            site_changes = compare_rows(pair[0], pair[1], threshold)
+            if site_changes:
+                changes.append({'url': pair[1]['url'], 'before': pair[0]['timestamp'],
+                                'after': pair[1]['timestamp'], 'changes': site_changes})
+    elapsed = (time.perf_counter() - start) * 1000
+    store.close()
+    
+    if field:
+        changes = [dict(item, changes=[c for c in item['changes'] if c['field'] == field]) for item in changes]
+        changes = [item for item in changes if item['changes']]
+    
+    if as_json:
+        print(json.dumps(changes, ensure_ascii=False, indent=2))
+        return
+    
+    labels = {'lost': '❌ пропал', 'gained': '✅ появился', 'changed': '✏️ изменен', 'grew': '📈 вырос', 'shrank': '📉 уменьшился',
+              'failed': '❌ ошибка анализа', 'recovered': '✅ снова доступен'}
+    table = Table(show_header=True, header_style="bold magenta", title="Изменения")
+    table.add_column("URL", style="cyan")
+    table.add_column("Поле", style="green")
+    table.add_column("Изменение")
+    table.add_column("Было → стало")
+    for item in changes:
+        for change in item['changes']:
+            table.add_row(item['url'], change['field'], labels.get(change['kind'], change['kind']),
+                          f"{change['before']} → {change['after']}")
+    console.print(table)
+    console.print(f"[dim]Сайтов с изменениями: {len(changes)}, запрос: {elapsed:.1f} мс[/dim]")
+
+@app.command("tls-scan")
+def tls_scan(
+    source: str = typer.Argument(..., help="Файл со списком хостов (host, host:port или URL) или '-' для stdin"),
+    concurrency: int = typer.Option(200, "--concurrency", "-c", help="Максимум одновременных соединений"),
+    timeout: float = typer.Option(5, "--timeout", "-t", help="Таймаут соединения с хостом (DNS, TCP и TLS), сек"),
+    warn_days: int = typer.Option(30, "--warn-days", help="Предупреждать о сертификатах, истекающих в течение N дней"),
+    output: str = typer.Option(None, "--output", "-o", help="Путь для сохранения результатов в JSON"),
+    strict: bool = typer.Option(False, "--strict", help="Код возврата 1, если есть невалидные или истекающие сертификаты")
+):
+    """
+    Проверка TLS-сертификатов списка хостов
+    """
+    from rich.markup import escape
+    from rich.table import Table
+    from batch import read_urls
+    from tls_scanner import TlsScanner, parse_target
+    
+    try:
+        targets = list(dict.fromkeys(parse_target(line) for line in read_urls(source)))
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Не удалось прочитать список хостов: {str(e)}[/red]")
+        raise typer.Exit(1)
+    if not targets:
+        console.print("[yellow]Список хостов пуст[/yellow]")
+        raise typer.Exit(1)
+    
+    scanner = TlsScanner(timeout=timeout, concurrency=concurrency)
+    start = time.perf_counter()
+    with console.status(f"[cyan]Проверка {len(targets)} хостов..."):
+        results = scanner.sweep(targets)
+    elapsed = time.perf_counter() - start
+    
+    # Сначала ошибки, затем сертификаты по возрастанию оставшегося срока
+    results.sort(key=lambda item: (item.get('expires_days') is not None, item.get('expires_days') or 0))
+    table = Table(show_header=True, header_style="bold magenta", title="TLS-сертификаты")
+    table.add_column("Хост", style="cyan")
+    table.add_column("Дней", justify="right")
+    table.add_column("Издатель", style="green")
+    table.add_column("Протокол")
+    table.add_column("Статус")
+    problems = 0
+    for item in results:
+        days = item.get('expires_days')
+        expiring = days is not None and days <= warn_days
+        if not item['valid'] or expiring:
+            problems += 1
+        if item['valid']:
+            status = "⚠️ истекает" if expiring else "✅"
+        else:
+            status = f"❌ {escape(str(item.get('error', '')))[:80]}"
+        table.add_row(
+            f"{item['host']}:{item['port']}",
+            f"{days:.0f}" if days is not None else '—',
+            (item.get('issuer') or {}).get('organizationName') or (item.get('issuer') or {}).get('commonName', '—'),
+            item.get('version') or '—',
+            status
+        )
+    console.print(table)
+    console.print(
+        f"\n[bold]Хостов:[/bold] {len(results)}  [red]Проблем:[/red] {problems}  "
+        f"[cyan]Время:[/cyan] {elapsed:.2f} сек"
+    )
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': datetime.now().isoformat(), 'results': results}, f, ensure_ascii=False, indent=2)
+        console.print(f"\n[green]Результаты сохранены в файл: {output}[/green]")
+    
+    if strict and problems:
+        raise typer.Exit(1)
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Адрес, на котором принимаются запросы"),
+    port: int = typer.Option(8787, "--port", "-p", help="Порт HTTP-сервиса"),
+    concurrency: int = typer.Option(10, "--concurrency", "-c", help="Максимум одновременно анализируемых сайтов"),
+    per_host: int = typer.Option(2, "--per-host", help="Максимум одновременно анализируемых сайтов одного хоста"),
+    timeout: List[str] = typer.Option(None, "--timeout", "-t", help="Таймаут этапа в формате этап=секунды (ssl, fetch, site_files, parse, resources, ai)"),
+    parse_workers: int = typer.Option(None, "--parse-workers", help="Число процессов для разбора HTML (по умолчанию по числу ядер, 0 — разбор в потоках)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать кэш анализов Gemini и сохраненные страницы")
+):
+    """
+    Локальный HTTP/JSON-сервис анализа с постоянно загруженным парсером
+    """
+    from service import AnalysisService, create_server
+    
+    try:
+        parser = ParsLinkAI(use_cache=not no_cache)
+    except ValueError as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(1)
+    
+    service = AnalysisService(
+        parser,
+        concurrency=concurrency,
+        per_host=per_host,
+        timeouts=parse_stage_timeouts(timeout),
+        parse_workers=parse_workers,
+        store=open_result_store(),
+        version=VERSION
+    )
+    try:
+        server = create_server(service, host, port)
+    except OSError as e:
+        console.print(f"[red]Не удалось открыть {host}:{port}: {str(e)}[/red]")
+        raise typer.Exit(1)
+    service.start()
+    console.print(f"[green]ParsLinkAI слушает http://{host}:{server.server_address[1]}[/green] "
+                  f"(POST /analyze, POST /analyze-many, GET /health; Ctrl+C — остановка)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Остановка сервиса...[/yellow]")
+    finally:
+        server.server_close()
+        service.close()
+
+def display_crawl_summary(report: Dict):
+    """Отображение сводки обхода сайта"""
+    from rich.table import Table
+    
+    rollup = report['rollup']
+    performance = rollup['performance']
+    table = Table(show_header=True, header_style="bold magenta", title=f"Обход сайта {report['url']}")
+    table.add_column("Параметр", style="cyan")
+    table.add_column("Значение", style="green")
+    
+    table.add_row("Страниц проанализировано", str(rollup['pages']))
+    table.add_row("Ошибок", str(rollup['errors']))
+    table.add_row("Пропущено (robots.txt / не HTML)", f"{rollup['skipped']['robots']} / {rollup['skipped']['non_html']}")
+    table.add_row("Коды ответов", ', '.join(f"{code}: {count}" for code, count in rollup['status_counts'].items()))
+    table.add_row("Страниц по глубине", ', '.join(f"{depth}: {count}" for depth, count in rollup['depths'].items()))
+    table.add_row("Общий размер", f"{performance['total_size_kb']:.2f} КБ")
+    table.add_row("Средний размер страницы", f"{performance['avg_size_kb']:.2f} КБ")
+    table.add_row("Среднее время загрузки", f"{performance['avg_load_time']:.2f} сек")
+    table.add_row("Изображения без alt", f"{performance['images_without_alt']} из {performance['images']}")
+    table.add_row("Без title / description", f"{len(rollup['seo']['missing_title'])} / {len(rollup['seo']['missing_description'])}")
+    table.add_row("Без h1 / несколько h1", f"{len(rollup['seo']['missing_h1'])} / {len(rollup['seo']['multiple_h1'])}")
+    for header, percent in rollup['security_headers'].items():
+        table.add_row(f"{header}", f"{percent:.0f}% страниц")
+    table.add_row("Robots.txt / Sitemap.xml", f"{'✅' if report['robots'] else '❌'} / {'✅' if report['sitemap'] else '❌'}")
+    table.add_row("Время обхода", f"{report['elapsed']:.2f} сек")
+    
+    console.print("\n")
+    console.print(table)
+    
+    if performance['slowest']:
+        slow_table = Table(show_header=True, header_style="bold yellow", title="Самые медленные страницы")
+        slow_table.add_column("URL", style="cyan")
+        slow_table.add_column("Время", style="green", justify="right")
+        for item in performance['slowest'][:5]:
+            slow_table.add_row(item['url'], f"{item['load_time']:.2f} сек")
+        console.print(slow_table)
+    
+    if rollup['broken']:
+        broken_table = Table(show_header=True, header_style="bold red", title="Недоступные страницы")
+        broken_table.add_column("URL", style="cyan")
+        broken_table.add_column("Ошибка", style="red")
+        for item in rollup['broken'][:10]:
+            broken_table.add_row(item['url'], str(item['status'] or item['error']))
+        console.print(broken_table)
+
+@app.command()
+def crawl(
+    url: str = typer.Argument(..., help="Начальный URL сайта"),
+    max_pages: int = typer.Option(100, "--max-pages", "-n", help="Максимум страниц для анализа"),
+    max_depth: int = typer.Option(3, "--max-depth", "-d", help="Максимальная глубина ссылок от начальной страницы"),
+    workers: int = typer.Option(4, "--workers", "-w", help="Число параллельных воркеров"),
+    delay: float = typer.Option(0.5, "--delay", help="Минимальная задержка между запросами к хосту (сек), учитывается Crawl-delay"),
+    bloom: bool = typer.Option(False, "--bloom", help="Фильтр Блума для дедупликации (включается автоматически при --max-pages больше 50000)"),
+    output: str = typer.Option(None, "--output", "-o", help="Путь для сохранения сводки в JSON"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать сохраненные страницы")
+):
+    """
+    Обход сайта по внутренним ссылкам и сводный анализ
+    """
+    from crawler import SiteCrawler
+    
+    parser = ParsLinkAI(use_cache=not no_cache, require_model=False)
+    crawler = SiteCrawler(
+        parser,
+        max_pages=max_pages,
+        max_depth=max_depth,
+        workers=workers,
+        delay=delay,
+        use_bloom=True if bloom else None
+    )
+    try:
+        with console.status(f"[cyan]Обход сайта {url}..."):
+            report = crawler.crawl(url)
+    except ValueError as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(1)
+    
+    display_crawl_summary(report)
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        console.print(f"\n[green]Результаты сохранены в файл: {output}[/green]")
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
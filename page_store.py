@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Версия формата сохраненных метрик: при изменении анализаторов
+# старые записи перестают использоваться
+STORE_VERSION = 4
+
+
+def default_store_dir() -> Path:
+    return Path.home() / '.parslinkai' / 'pages'
+
+
+class PageStore:
+    """
+    Локальное хранилище загруженных страниц для условных запросов
+
+    Для каждого URL хранятся валидаторы ETag и Last-Modified и уже
+    посчитанные метрики. Если сервер отвечает 304, страница не
+    загружается и не разбирается повторно: используются метрики.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else default_store_dir()
+
+    def _path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return (self.directory / key[:2] / key).with_suffix('.json')
+
+    def _load_meta(self, url: str) -> Optional[Dict]:
+        meta_path = self._path(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != STORE_VERSION or meta.get('url') != url:
+            return None
+        return meta
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки If-None-Match/If-Modified-Since для URL"""
+        meta = self._load_meta(url)
+        if not meta:
+            return {}
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def has_page(self, url: str) -> bool:
+        return self._load_meta(url) is not None
+
+    def load_page(self, url: str) -> Optional[Dict]:
+        """Сохраненные метрики страницы после ответа 304"""
+        meta = self._load_meta(url)
+        return meta['page'] if meta else None
+
+    def save(self, url: str, response, page: Dict):
+        """Сохранение страницы, если сервер прислал валидаторы"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        meta_path = self._path(url)
+        meta = {
+            'version': STORE_VERSION,
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored': time.time(),
+            'page': page,
+        }
+        try:
+            meta_path.parent.mkdir(parents=True, exist_ok=True)
+            meta_tmp = meta_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(meta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(meta_tmp, meta_path)
+        except OSError:
+            pass
+
+    def discard(self, url: str):
+        """Удаление записи (например, если 304 пришел без сохраненных данных)"""
+        try:
+            self._path(url).unlink()
+        except OSError:
+            pass
@@ -0,0 +1,104 @@
+from typing import Dict, List, Tuple
+
+from analyzers import SECURITY_HEADERS
+from scheduler import estimate_tokens
+
+# Бюджет промпта по умолчанию (в токенах по оценке estimate_tokens)
+DEFAULT_MAX_TOKENS = 600
+# Остаток бюджета, меньше которого блок не обрезается, а отбрасывается
+MIN_BLOCK_TOKENS = 16
+
+INSTRUCTIONS = """Пожалуйста, предоставь структурированный анализ, включающий:
+1. Основную тему и назначение сайта
+2. Ключевые темы и разделы
+3. Целевую аудиторию
+4. Качество и актуальность контента
+5. Рекомендации по улучшению производительности и SEO
+6. Оценку безопасности"""
+
+
+def metrics_summary(page: Dict) -> str:
+    """Краткая сводка метрик страницы: по одной строке на раздел"""
+    performance = page['performance']
+    seo = page['seo']
+    images = performance.get('images', [])
+    without_alt = sum(1 for image in images if not image.get('has_alt'))
+    transfer = f", на проводе {performance['transfer_size']:.1f} КБ" if 'transfer_size' in performance else ""
+    encoding = f" ({performance['content_encoding']})" if performance.get('content_encoding') else ""
+    lines = [
+        f"Производительность: HTML {performance['page_size']:.1f} КБ{transfer}{encoding}, "
+        f"скриптов {performance['scripts_count']}, стилей {performance['styles_count']}, "
+        f"изображений {len(images)} (без alt: {without_alt})"
+    ]
+    resources = performance.get('resources')
+    if resources and 'error' not in resources:
+        lines.append(
+            f"Вес с ресурсами: {resources['total_weight']:.1f} КБ (ресурсов: {resources['assets_count']}, "
+            f"без сжатия: {len(resources['uncompressed'])}, без кэширования: {len(resources['uncached'])})"
+        )
+    headings = ' '.join(f"{tag}={count}" for tag, count in seo['headings'].items() if count) or "нет"
+    lines.append(
+        f"SEO: заголовки {headings}; ссылки внутренние {len(seo['links']['internal'])}, "
+        f"внешние {len(seo['links']['external'])}; robots.txt {'есть' if seo.get('robots') else 'нет'}, "
+        f"sitemap.xml {'есть' if seo.get('sitemap') else 'нет'}"
+    )
+    security = page.get('security')
+    if security:
+        missing = [name for name in SECURITY_HEADERS if not security['headers'].get(name)]
+        lines.append(f"Безопасность: нет заголовков {', '.join(missing)}" if missing
+                     else "Безопасность: все проверяемые заголовки есть")
+    return '\n'.join(lines)
+
+
+def page_blocks(page: Dict) -> List[Tuple[str, str, float]]:
+    """Блоки контента (тег, текст, ценность); для страниц без разметки блоков — весь текст"""
+    content = page.get('main_content') or ''
+    blocks = page.get('content_blocks')
+    if blocks is None:
+        return [('p', content, 1.0)] if content else []
+    return [(block['tag'], content[block['start']:block['end']], block['score']) for block in blocks]
+
+
+def truncate_words(text: str, max_chars: int) -> str:
+    """Начало текста не длиннее max_chars, обрезанное по границе слова"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(' ', 1)[0]
+    return (cut or text[:max_chars]) + '…'
+
+
+def select_content(blocks: List[Tuple[str, str, float]], budget: int) -> str:
+    """
+    Самые ценные блоки, помещающиеся в бюджет токенов
+
+    Блоки берутся по убыванию ценности, в промпт попадают в порядке
+    документа; блок, который не помещается целиком, обрезается по слову.
+    """
+    # estimate_tokens считает около 4 символов на токен: бюджет ведется в символах
+    budget_chars = budget * 4
+    chosen: Dict[int, str] = {}
+    for index in sorted(range(len(blocks)), key=lambda i: -blocks[i][2]):
+        if budget_chars < MIN_BLOCK_TOKENS * 4:
+            break
+        tag, text, _ = blocks[index]
+        line = f"{'#' * int(tag[1])} {text}" if tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6') else text
+        if len(line) + 1 > budget_chars:
+            line = truncate_words(line, budget_chars - 2)
+        chosen[index] = line
+        budget_chars -= len(line) + 1
+    return '\n'.join(chosen[index] for index in sorted(chosen))
+
+
+def build_prompt(url: str, page: Dict, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    """
+    Промпт для Gemini в пределах бюджета токенов
+
+    Заголовок, описание, сводка метрик и инструкции включаются всегда,
+    оставшийся бюджет заполняется самыми ценными блоками основного контента.
+    """
+    head = (f"Проанализируй следующий веб-сайт и предоставь подробную информацию:\n"
+            f"URL: {url}\nЗаголовок: {page['title']}\nОписание: {page['description']}\n")
+    summary = metrics_summary(page)
+    fixed = f"{head}\nОсновной контент:\n\n{summary}\n\n{INSTRUCTIONS}\n"
+    content = select_content(page_blocks(page), max_tokens - estimate_tokens(fixed))
+    return f"{head}\nОсновной контент:\n{content or 'не найден'}\n\n{summary}\n\n{INSTRUCTIONS}\n"
@@ -0,0 +1,250 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from transport import CHUNK_SIZE
+
+# Схемы ссылок, которые не загружаются по сети
+SKIP_SCHEMES = ('data:', 'blob:', 'javascript:', 'about:')
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ('text/', 'javascript', 'json', 'xml', 'svg')
+# Ресурсы меньше этого размера не считаются проблемой без сжатия
+MIN_COMPRESS_BYTES = 1024
+# Сколько самых тяжелых ресурсов попадает в отчет
+LARGEST_COUNT = 10
+
+CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+MAX_AGE = re.compile(r'(?:s-)?max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+
+
+def page_assets(url: str, performance: Dict) -> List[Dict]:
+    """
+    Абсолютные URL скриптов, стилей и изображений страницы без повторов
+
+    Фрагмент (#...) отбрасывается, встроенные data:/blob: ресурсы пропускаются.
+    """
+    candidates = [('script', src) for src in performance.get('scripts', ())]
+    candidates += [('stylesheet', href) for href in performance.get('stylesheets', ())]
+    candidates += [('image', image.get('src')) for image in performance.get('images', ())]
+
+    assets = []
+    seen = set()
+    for kind, ref in candidates:
+        ref = (ref or '').strip()
+        if not ref or ref.lower().startswith(SKIP_SCHEMES):
+            continue
+        absolute = urljoin(url, ref).split('#', 1)[0]
+        if urlsplit(absolute).scheme not in ('http', 'https') or absolute in seen:
+            continue
+        seen.add(absolute)
+        assets.append({'url': absolute, 'type': kind})
+    return assets
+
+
+def cache_ttl(headers) -> Optional[int]:
+    """
+    Время кэширования ресурса в секундах по Cache-Control и Expires
+
+    0 — кэширование запрещено или срок уже истек, None — заголовков нет.
+    """
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    expires = headers.get('Expires')
+    if not expires:
+        return None
+    try:
+        expires_at = parsedate_to_datetime(expires)
+    except (TypeError, ValueError):
+        # Некорректная дата в Expires означает уже истекший срок
+        return 0
+    try:
+        date_at = parsedate_to_datetime(headers.get('Date'))
+    except (TypeError, ValueError):
+        date_at = datetime.now(timezone.utc)
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    if date_at.tzinfo is None:
+        date_at = date_at.replace(tzinfo=timezone.utc)
+    return max(0, int((expires_at - date_at).total_seconds()))
+
+
+def is_compressible(asset: Dict) -> bool:
+    content_type = (asset.get('content_type') or '').lower()
+    if content_type:
+        return any(marker in content_type for marker in COMPRESSIBLE_TYPES)
+    return asset['type'] in ('script', 'stylesheet')
+
+
+class ResourceAnalyzer:
+    """
+    Оценка веса ресурсов страницы (скрипты, стили, изображения)
+
+    Размер и заголовки кэширования запрашиваются через HEAD, а если сервер
+    не поддерживает HEAD или не сообщает длину — через GET с Range: bytes=0-0
+    (полный размер берется из Content-Range). Запросы выполняются в пуле
+    потоков через общий HTTP-транспорт, число одновременных запросов к
+    одному хосту ограничено per_host. Результат по каждому URL
+    запоминается, поэтому общие для сайтов ресурсы (CDN) проверяются один раз:
+    хранится не больше memo_size последних URL, каждый не дольше memo_ttl секунд.
+    """
+
+    def __init__(self, transport, concurrency: int = 16, per_host: int = 6,
+                 timeout: float = 10, max_assets: int = 200, memo_size: int = 5000,
+                 memo_ttl: float = 3600):
+        self.transport = transport
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.max_assets = max_assets
+        self.memo_size = max(0, memo_size)
+        self.memo_ttl = memo_ttl
+        self._lock = threading.Lock()
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        # URL -> (время запроса, результат) в порядке последнего использования
+        self._results: 'OrderedDict[str, Tuple[float, Future]]' = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _submit(self, url: str) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='resources')
+            now = time.monotonic()
+            entry = self._results.get(url)
+            if entry is not None and (not entry[1].done() or not self.memo_ttl
+                                      or now - entry[0] <= self.memo_ttl):
+                self._results.move_to_end(url)
+                return entry[1]
+            future = self._executor.submit(self._probe, url)
+            self._results[url] = (now, future)
+            self._results.move_to_end(url)
+            # Давно не использовавшиеся URL вытесняются (LRU)
+            while len(self._results) > self.memo_size:
+                self._results.popitem(last=False)
+            return future
+
+    def _probe(self, url: str) -> Dict:
+        with self._host_limit(url):
+            try:
+                return self._request(url)
+            except Exception as e:
+                return {'error': str(e) or type(e).__name__}
+
+    def _request(self, url: str) -> Dict:
+        session = self.transport.session
+        response = session.head(url, timeout=self.timeout, allow_redirects=True)
+        size = response.headers.get('Content-Length')
+        if response.status_code < 400 and size is not None:
+            return self._describe(response, int(size), response.headers.get('Content-Encoding'))
+
+        # HEAD не поддерживается или не сообщает размер: запрашиваем один байт
+        response = session.get(url, timeout=self.timeout, stream=True, headers={'Range': 'bytes=0-0'})
+        try:
+            if response.status_code >= 400:
+                return {'status': response.status_code, 'error': f"HTTP {response.status_code}"}
+            if response.status_code == 206:
+                match = CONTENT_RANGE_TOTAL.search(response.headers.get('Content-Range', ''))
+                size = int(match.group(1)) if match else None
+                # Фрагмент обычно отдается без сжатия: о сжатии полного ответа судить нельзя
+                return self._describe(response, size, None, compression_known=False)
+            size = response.headers.get('Content-Length')
+            if size is None:
+                size = self._count_body(response)
+            return self._describe(response, int(size), response.headers.get('Content-Encoding'))
+        finally:
+            response.close()
+
+    def _count_body(self, response) -> int:
+        """Размер тела на проводе, если сервер не сообщил длину (не больше max_bytes)"""
+        limit = self.transport.max_bytes
+        for _ in response.raw.stream(CHUNK_SIZE, decode_content=False):
+            if limit is not None and response.raw.tell() >= limit:
+                break
+        return response.raw.tell()
+
+    @staticmethod
+    def _describe(response, size: Optional[int], encoding: Optional[str],
+                  compression_known: bool = True) -> Dict:
+        headers = response.headers
+        return {
+            'status': response.status_code,
+            'size': size,
+            'content_type': headers.get('Content-Type'),
+            'content_encoding': encoding,
+            'compressed': bool(encoding and encoding.lower() != 'identity') if compression_known else None,
+            'cache_control': headers.get('Cache-Control'),
+            'cache_ttl': cache_ttl(headers),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+
+    def measure(self, assets: Iterable[Dict]) -> List[Dict]:
+        """Размеры и заголовки ресурсов (запросы выполняются параллельно)"""
+        assets = list(assets)[:self.max_assets]
+        futures = [(asset, self._submit(asset['url'])) for asset in assets]
+        return [dict(asset, **future.result()) for asset, future in futures]
+
+    def analyze(self, url: str, performance: Dict) -> Dict:
+        """
+        Отчет о весе страницы
+
+        Общий вес — HTML на проводе плюс все ресурсы с известным размером.
+        Размеры в отчете указаны в КБ, как page_size.
+        """
+        found = page_assets(url, performance)
+        assets = self.measure(found)
+        measured = [asset for asset in assets if asset.get('size') is not None]
+        assets_bytes = sum(asset['size'] for asset in measured)
+        html_kb = performance.get('transfer_size', performance.get('page_size', 0.0))
+
+        by_type: Dict[str, Dict] = {}
+        for asset in measured:
+            entry = by_type.setdefault(asset['type'], {'count': 0, 'size': 0.0})
+            entry['count'] += 1
+            entry['size'] += asset['size'] / 1024
+
+        def brief(asset: Dict, **extra) -> Dict:
+            return dict({'url': asset['url'], 'type': asset['type'],
+                         'size': asset['size'] / 1024 if asset.get('size') is not None else None}, **extra)
+
+        return {
+            'total_weight': html_kb + assets_bytes / 1024,
+            'assets_weight': assets_bytes / 1024,
+            'assets_count': len(found),
+            'checked': len(assets),
+            'unknown_size': sum(1 for asset in assets if asset.get('size') is None and 'error' not in asset),
+            'by_type': by_type,
+            'largest': [brief(asset) for asset in sorted(measured, key=lambda a: a['size'], reverse=True)[:LARGEST_COUNT]],
+            'uncompressed': [
+                brief(asset, content_type=asset.get('content_type')) for asset in measured
+                if asset.get('compressed') is False and asset['size'] >= MIN_COMPRESS_BYTES and is_compressible(asset)
+            ],
+            'uncached': [
+                brief(asset, cache_control=asset.get('cache_control')) for asset in assets
+                if 'error' not in asset and not asset.get('cache_ttl')
+            ],
+            'errors': [{'url': asset['url'], 'error': asset['error']} for asset in assets if 'error' in asset],
+        }
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
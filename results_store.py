@@ -0,0 +1,309 @@
+import json
+import sqlite3
+import ssl
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Версия схемы базы (PRAGMA user_version)
+SCHEMA_VERSION = 1
+
+# Заголовки безопасности и соответствующие столбцы
+HEADER_COLUMNS = {
+    'HSTS': 'has_hsts',
+    'CSP': 'has_csp',
+    'X-Frame-Options': 'has_xfo',
+    'X-XSS-Protection': 'has_xxp',
+}
+
+# Логические признаки, изменения которых показывает diff
+FLAG_COLUMNS = dict(HEADER_COLUMNS, **{
+    'SSL': 'ssl_valid',
+    'robots.txt': 'robots',
+    'sitemap.xml': 'sitemap',
+})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    run_id TEXT,
+    model TEXT,
+    title TEXT,
+    error TEXT,
+    error_stage TEXT,
+    analysis_error TEXT,
+    page_size REAL,
+    transfer_size REAL,
+    load_time REAL,
+    scripts_count INTEGER,
+    styles_count INTEGER,
+    images_count INTEGER,
+    images_without_alt INTEGER,
+    internal_links INTEGER,
+    external_links INTEGER,
+    has_hsts INTEGER,
+    has_csp INTEGER,
+    has_xfo INTEGER,
+    has_xxp INTEGER,
+    ssl_valid INTEGER,
+    ssl_expires TEXT,
+    robots INTEGER,
+    sitemap INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_url_timestamp ON results(url, timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_host_timestamp ON results(host, timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_page_size ON results(page_size);
+CREATE INDEX IF NOT EXISTS idx_results_ssl_expires ON results(ssl_expires);
+CREATE INDEX IF NOT EXISTS idx_results_security ON results(has_hsts, has_csp, timestamp);
+"""
+
+COLUMNS = (
+    'url', 'host', 'timestamp', 'run_id', 'model', 'title', 'error', 'error_stage', 'analysis_error',
+    'page_size', 'transfer_size', 'load_time', 'scripts_count', 'styles_count', 'images_count',
+    'images_without_alt', 'internal_links', 'external_links', 'has_hsts', 'has_csp', 'has_xfo',
+    'has_xxp', 'ssl_valid', 'ssl_expires', 'robots', 'sitemap', 'data',
+)
+
+INSERT = f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+# Последний результат каждого URL не позже заданного момента: для каждого
+# URL одна выборка по индексу (url, timestamp) вместо сортировки всей истории
+LATEST = """
+SELECT r.* FROM (SELECT DISTINCT url FROM results {where}) u
+JOIN results r ON r.id = (
+    SELECT id FROM results r2 WHERE r2.url = u.url AND r2.timestamp <= :until
+    ORDER BY r2.timestamp DESC, r2.id DESC LIMIT 1
+)
+"""
+
+
+def default_results_path() -> Path:
+    return Path.home() / '.parslinkai' / 'results.db'
+
+
+def ssl_expiry(ssl_info: Optional[Dict]) -> Optional[str]:
+    """Срок действия сертификата в ISO-формате (UTC)"""
+    expires = (ssl_info or {}).get('expires')
+    if not expires:
+        return None
+    try:
+        seconds = ssl.cert_time_to_seconds(expires)
+    except ValueError:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def parse_moment(value: str, now: Optional[datetime] = None) -> str:
+    """
+    Момент времени из ISO-даты или относительного значения (30m, 24h, 7d, 2w)
+
+    Возвращает строку в формате datetime.isoformat(), который
+    используется в поле timestamp результатов.
+    """
+    now = now or datetime.now()
+    units = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+    value = value.strip()
+    if value and value[-1] in units and value[:-1].isdigit():
+        return (now - timedelta(**{units[value[-1]]: int(value[:-1])})).isoformat()
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"Некорректный момент времени: {value} (ожидается ISO-дата или 30m, 24h, 7d, 2w)")
+
+
+def _flag(value) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+def result_row(result: Dict, run_id: Optional[str] = None) -> tuple:
+    """Строка таблицы results из результата анализа (или ошибки пакетного анализа)"""
+    performance = result.get('performance') or {}
+    seo = result.get('seo') or {}
+    links = seo.get('links') or {}
+    headers = (result.get('security') or {}).get('headers') or {}
+    ssl_info = result.get('ssl_info')
+    images = performance.get('images')
+    has_page = 'error' not in result
+
+    try:
+        host = urlsplit(result['url']).hostname or ''
+    except ValueError:
+        # Ошибка некорректного URL тоже сохраняется в истории
+        host = ''
+    row = {
+        'url': result['url'],
+        'host': host,
+        'timestamp': result.get('timestamp') or datetime.now().isoformat(),
+        'run_id': run_id,
+        'model': result.get('model'),
+        'title': result.get('title'),
+        'error': result.get('error'),
+        'error_stage': result.get('stage'),
+        'analysis_error': result.get('analysis_error'),
+        'page_size': performance.get('page_size'),
+        'transfer_size': performance.get('transfer_size'),
+        'load_time': result.get('load_time'),
+        'scripts_count': performance.get('scripts_count'),
+        'styles_count': performance.get('styles_count'),
+        'images_count': len(images) if images is not None else None,
+        'images_without_alt': sum(1 for image in images if not image.get('has_alt')) if images is not None else None,
+        'internal_links': len(links['internal']) if 'internal' in links else None,
+        'external_links': len(links['external']) if 'external' in links else None,
+        'ssl_valid': _flag(ssl_info.get('valid')) if ssl_info else None,
+        'ssl_expires': ssl_expiry(ssl_info),
+        'robots': int(bool(seo.get('robots'))) if has_page else None,
+        'sitemap': int(bool(seo.get('sitemap'))) if has_page else None,
+        'data': json.dumps(result, ensure_ascii=False, separators=(',', ':')),
+    }
+    for header, column in HEADER_COLUMNS.items():
+        row[column] = int(bool(headers.get(header))) if has_page else None
+    return tuple(row[column] for column in COLUMNS)
+
+
+class ResultStore:
+    """
+    База результатов анализа (SQLite)
+
+    Каждый результат хранится целиком (JSON в столбце data) и в виде
+    индексируемых столбцов: URL, время, размер страницы, заголовки
+    безопасности, срок действия сертификата. Журнал WAL позволяет читать
+    историю во время записи, пакетные результаты вставляются одной
+    транзакцией.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_results_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+
+    def _migrate(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with self._db:
+                self._db.executescript(SCHEMA)
+                self._db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def add(self, result: Dict, run_id: Optional[str] = None):
+        self.add_many([result], run_id)
+
+    def add_many(self, results: Iterable[Dict], run_id: Optional[str] = None) -> int:
+        """Вставка результатов одной транзакцией"""
+        rows = [result_row(result, run_id) for result in results]
+        with self._lock, self._db:
+            self._db.executemany(INSERT, rows)
+        return len(rows)
+
+    def history(self, url: Optional[str] = None, limit: int = 20,
+                since: Optional[str] = None) -> List[Dict]:
+        """Результаты URL (или всех сайтов) от новых к старым"""
+        where, params = [], []
+        if url:
+            where.append('url = ?')
+            params.append(url)
+        if since:
+            where.append('timestamp >= ?')
+            params.append(since)
+        sql = 'SELECT * FROM results'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params + [limit])]
+
+    def latest(self, until: Optional[str] = None, url: Optional[str] = None) -> Dict[str, Dict]:
+        """Последний результат каждого URL не позже until"""
+        params = {'until': until or datetime.max.isoformat(), 'url': url}
+        where = 'WHERE url = :url' if url else ''
+        with self._lock:
+            rows = self._db.execute(LATEST.format(where=where), params).fetchall()
+        return {row['url']: dict(row) for row in rows}
+
+    def previous_two(self, url: str) -> List[Dict]:
+        """Два последних результата URL (для diff по одному сайту)"""
+        return list(reversed(self.history(url, limit=2)))
+
+    def diff(self, since: str, until: Optional[str] = None, url: Optional[str] = None,
+             size_threshold: float = 0.1) -> List[Dict]:
+        """
+        Изменения между состоянием сайтов на момент since и на момент until
+
+        Для каждого URL сравниваются последние результаты до since и до
+        until: потерянные и появившиеся заголовки безопасности, robots.txt,
+        sitemap.xml, валидность и срок сертификата, заголовок страницы,
+        изменение размера больше size_threshold, появление ошибок.
+        """
+        before = self.latest(since, url)
+        after = self.latest(until, url)
+        changes = []
+        for site, new in after.items():
+            old = before.get(site)
+            if old is None or old['id'] == new['id']:
+                continue
+            site_changes = compare_rows(old, new, size_threshold)
+            if site_changes:
+                changes.append({
+                    'url': site,
+                    'before': old['timestamp'],
+                    'after': new['timestamp'],
+                    'changes': site_changes,
+                })
+        return changes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT COUNT(*) AS results, COUNT(DISTINCT url) AS urls, '
+                'MIN(timestamp) AS first, MAX(timestamp) AS last FROM results'
+            ).fetchone()
+        return dict(row, path=str(self.path))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def compare_rows(old: Dict, new: Dict, size_threshold: float = 0.1) -> List[Dict]:
+    """Список изменений между двумя строками results"""
+    changes = []
+    for name, column in FLAG_COLUMNS.items():
+        if old[column] is None or new[column] is None or old[column] == new[column]:
+            continue
+        changes.append({
+            'field': name,
+            'kind': 'gained' if new[column] else 'lost',
+            'before': bool(old[column]),
+            'after': bool(new[column]),
+        })
+    if old['ssl_expires'] and new['ssl_expires'] and old['ssl_expires'] != new['ssl_expires']:
+        changes.append({'field': 'ssl_expires', 'kind': 'changed', 'before': old['ssl_expires'], 'after': new['ssl_expires']})
+    if old['title'] is not None and new['title'] is not None and old['title'] != new['title']:
+        changes.append({'field': 'title', 'kind': 'changed', 'before': old['title'], 'after': new['title']})
+    if old['page_size'] and new['page_size'] is not None:
+        delta = (new['page_size'] - old['page_size']) / old['page_size']
+        if abs(delta) > size_threshold:
+            changes.append({
+                'field': 'page_size',
+                'kind': 'grew' if delta > 0 else 'shrank',
+                'before': round(old['page_size'], 2),
+                'after': round(new['page_size'], 2),
+            })
+    if bool(old['error']) != bool(new['error']):
+        changes.append({
+            'field': 'error',
+            'kind': 'recovered' if old['error'] else 'failed',
+            'before': old['error'],
+            'after': new['error'],
+        })
+    return changes
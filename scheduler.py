@@ -0,0 +1,316 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# HTTP-коды ошибок Gemini API, при которых запрос повторяется
+RETRY_CODES = frozenset([429, 500, 502, 503, 504])
+# Исключения google.api_core, соответствующие временным ошибкам
+RETRY_EXCEPTIONS = frozenset([
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable',
+    'InternalServerError', 'DeadlineExceeded', 'BadGateway', 'GatewayTimeout',
+])
+
+PACK_HEADER = (
+    "Ниже приведены данные нескольких веб-сайтов. Проанализируй каждый сайт "
+    "отдельно и независимо от остальных. Ответ для каждого сайта начни с "
+    "отдельной строки вида `=== САЙТ N ===`, где N — номер сайта из задания, "
+    "и не добавляй текст до первого такого маркера."
+)
+PACK_MARKER = re.compile(r'^\s*=+\s*САЙТ\s+(\d+)\s*=+\s*$', re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (около 4 символов на токен)"""
+    return max(1, len(text) // 4)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Временная ли ошибка (квота, перегрузка, 5xx)"""
+    if type(error).__name__ in RETRY_EXCEPTIONS:
+        return True
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if isinstance(code, int) and code in RETRY_CODES:
+        return True
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status in RETRY_CODES
+
+
+class TokenBucket:
+    """
+    Бюджет в единицах за минуту (запросы или токены)
+
+    Резервирование может уйти в минус: вызывающий получает задержку,
+    после которой его запрос укладывается в бюджет.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Запрос больше всего бюджета не должен блокироваться навсегда
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """Поправка после получения фактического расхода"""
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """Ограничение запросов и токенов в минуту, общее для потоков и asyncio"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Резервирование одного запроса на tokens токенов, возвращает задержку в секундах"""
+        with self._lock:
+            delay = 0.0
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1))
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(tokens))
+            return delay
+
+    def adjust(self, tokens: int):
+        if self.tokens and tokens:
+            with self._lock:
+                self.tokens.adjust(tokens)
+
+
+class GeminiScheduler:
+    """
+    Планировщик запросов к Gemini
+
+    Соблюдает бюджет запросов и токенов в минуту, повторяет запросы при
+    429/5xx с экспоненциальной задержкой и случайным разбросом, ограничивает
+    число одновременных запросов. При pack_sites > 1 небольшие промпты,
+    пришедшие в течение pack_wait секунд, объединяются в один запрос.
+    """
+
+    def __init__(self, model, rpm: float = 15, tpm: float = 1_000_000, concurrency: int = 4,
+                 max_retries: int = 5, backoff_base: float = 2.0, backoff_max: float = 60.0,
+                 output_tokens: int = 1024, pack_sites: int = 1, pack_max_tokens: int = 8000,
+                 pack_wait: float = 0.5):
+        self.model = model
+        self.limiter = RateLimiter(rpm, tpm)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.output_tokens = output_tokens
+        self.pack_sites = max(1, pack_sites)
+        self.pack_max_tokens = pack_max_tokens
+        self.pack_wait = pack_wait
+        self.stats = {'requests': 0, 'retries': 0, 'packed_requests': 0, 'packed_sites': 0, 'failures': 0}
+        self._loop = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle = None
+        # Ссылки на задачи упаковки, чтобы их не собрал сборщик мусора
+        self._tasks = set()
+
+    def _backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка с полным случайным разбросом"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_usage(self, response, estimated: int):
+        usage = getattr(response, 'usage_metadata', None)
+        actual = getattr(usage, 'total_token_count', None)
+        if isinstance(actual, int):
+            self.limiter.adjust(actual - estimated)
+
+    def _loop_state(self):
+        """Примитивы asyncio привязаны к циклу событий, создаем их для текущего"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._pending = []
+            self._flush_handle = None
+            self._tasks = set()
+        return loop
+
+    def generate_sync(self, prompt: str) -> str:
+        """Блокирующий запрос с соблюдением бюджета и повторами"""
+        estimated = estimate_tokens(prompt) + self.output_tokens
+        attempt = 0
+        while True:
+            time.sleep(self.limiter.reserve(estimated))
+            try:
+                self.stats['requests'] += 1
+                response = self.model.generate_content(prompt)
+                self._record_usage(response, estimated)
+                return response.text
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.stats['failures'] += 1
+                    raise
+                self.stats['retries'] += 1
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def _generate_single(self, prompt: str) -> str:
+        loop = self._loop_state()
+        estimated = estimate_tokens(prompt) + self.output_tokens
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                await asyncio.sleep(self.limiter.reserve(estimated))
+                try:
+                    self.stats['requests'] += 1
+                    if hasattr(self.model, 'generate_content_async'):
+                        response = await self.model.generate_content_async(prompt)
+                    else:
+                        response = await loop.run_in_executor(None, self.model.generate_content, prompt)
+                    self._record_usage(response, estimated)
+                    return response.text
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        self.stats['failures'] += 1
+                        raise
+                    self.stats['retries'] += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+
+    async def generate(self, prompt: str) -> str:
+        """Асинхронный запрос (при включенной упаковке может быть объединен с другими)"""
+        loop = self._loop_state()
+        if self.pack_sites == 1 or estimate_tokens(prompt) > self.pack_max_tokens // self.pack_sites:
+            return await self._generate_single(prompt)
+
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self.pack_sites:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.pack_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_pack(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def build_pack_prompt(prompts: List[str]) -> str:
+        """Объединение промптов нескольких сайтов в один структурированный запрос"""
+        parts = [PACK_HEADER]
+        for number, prompt in enumerate(prompts, 1):
+            parts.append(f"\n--- Задание для сайта {number} ---\n{prompt.strip()}")
+        return '\n'.join(parts)
+
+    @staticmethod
+    def split_pack_response(text: str, count: int) -> Dict[int, str]:
+        """Разбор ответа на объединенный запрос по маркерам `=== САЙТ N ===`"""
+        sections: Dict[int, str] = {}
+        matches = list(PACK_MARKER.finditer(text))
+        for index, match in enumerate(matches):
+            number = int(match.group(1))
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+            body = text[match.end():end].strip()
+            if 1 <= number <= count and body:
+                sections[number] = body
+        return sections
+
+    async def _run_pack(self, batch: List[Tuple[str, asyncio.Future]]):
+        prompts = [prompt for prompt, _ in batch]
+        sections: Dict[int, str] = {}
+        if len(batch) > 1:
+            try:
+                text = await self._generate_single(self.build_pack_prompt(prompts))
+                sections = self.split_pack_response(text, len(batch))
+                self.stats['packed_requests'] += 1
+                self.stats['packed_sites'] += len(sections)
+            except Exception:
+                sections = {}
+
+        # Сайты, для которых ответ не разобран, запрашиваются по отдельности
+        async def resolve(number: int, prompt: str, future: asyncio.Future):
+            if future.done():
+                return
+            try:
+                result = sections.get(number)
+                if result is None:
+                    result = await self._generate_single(prompt)
+                # Вызывающий мог отменить ожидание, пока шел запрос
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+        await asyncio.gather(*(
+            resolve(number, prompt, future) for number, (prompt, future) in enumerate(batch, 1)
+        ))
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """
+    Локальная заглушка GenerativeModel для тестов и бенчмарков
+
+    Отвечает без сети с задержкой latency, умеет отвечать на объединенные
+    запросы по маркерам и имитировать failures временных ошибок (429).
+    """
+
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt: str) -> StubResponse:
+        with self._lock:
+            self.calls += 1
+            if self.failures > 0:
+                self.failures -= 1
+                error = RuntimeError("429 Resource has been exhausted (stub)")
+                error.code = 429
+                raise error
+        parts = re.split(r'^--- Задание для сайта (\d+) ---$', prompt, flags=re.MULTILINE)
+        if len(parts) > 1:
+            return StubResponse('\n'.join(
+                f"=== САЙТ {number} ===\n{self._analysis(section)}"
+                for number, section in zip(parts[1::2], parts[2::2])
+            ))
+        return StubResponse(self._analysis(prompt))
+
+    @staticmethod
+    def _analysis(prompt: str) -> str:
+        url = re.search(r'URL:\s*(\S+)', prompt)
+        return f"Анализ {url.group(1) if url else 'сайта'} (заглушка, {len(prompt)} символов промпта)"
+
+    def generate_content(self, prompt: str) -> StubResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def generate_content_async(self, prompt: str) -> StubResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
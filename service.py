@@ -0,0 +1,217 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from batch import BatchAnalyzer
+
+# Максимальный размер тела запроса к сервису
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def ndjson_line(result: Dict) -> str:
+    """Результат в виде одной строки NDJSON (с завершающим переводом строки)"""
+    return json.dumps(result, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class RequestError(Exception):
+    """Некорректный запрос к сервису"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    """
+    Долгоживущий сервис анализа
+
+    Один экземпляр ParsLinkAI (пул соединений, кэши, планировщик Gemini)
+    и один BatchAnalyzer обслуживают все запросы. Цикл событий работает
+    в отдельном потоке, потоки HTTP-сервера передают в него задания через
+    run_coroutine_threadsafe, поэтому глобальный и per-host лимиты, таймауты
+    этапов и пул процессов разбора общие для всех клиентов. Результаты
+    записываются в базу отдельным потоком, чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, parser, concurrency: int = 10, per_host: int = 2,
+                 timeouts: Optional[Dict[str, float]] = None, parse_workers: Optional[int] = None,
+                 store=None, version: str = ''):
+        self.parser = parser
+        self.store = store
+        self.version = version
+        self.batch = BatchAnalyzer(parser, concurrency=concurrency, per_host=per_host, timeouts=timeouts,
+                                   parse_workers=parse_workers, keep_traces=False)
+        self.started = time.time()
+        self.stats = {'requests': 0, 'sites': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='analysis-loop', daemon=True)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='results-store') if store else None
+
+    def start(self):
+        self._thread.start()
+        self._call(self._start_batch()).result()
+
+    async def _start_batch(self):
+        self.batch.start()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def submit(self, url: str, deep: Optional[bool] = None):
+        """Постановка сайта в очередь анализа, возвращает concurrent.futures.Future"""
+        future = self._call(self.batch.analyze_url(url, deep))
+        future.add_done_callback(self._record)
+        return future
+
+    def count_request(self):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+
+    def _record(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        with self._stats_lock:
+            self.stats['sites'] += 1
+            if 'error' in result:
+                self.stats['failed'] += 1
+        if self._writer:
+            # Callback выполняется в потоке цикла событий: запись в SQLite — в своем потоке
+            self._writer.submit(self.store.add, result)
+
+    def analyze(self, url: str, deep: Optional[bool] = None) -> Dict:
+        return self.submit(url, deep).result()
+
+    def analyze_many(self, urls: List[str], deep: Optional[bool] = None):
+        """Результаты по мере готовности (не в порядке списка)"""
+        futures = [self.submit(url, deep) for url in urls]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def health(self) -> Dict:
+        scheduler = self.parser.scheduler
+        cache = self.parser.cache
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            'status': 'ok',
+            'version': self.version,
+            'uptime': round(time.time() - self.started, 1),
+            'model': self.parser.model_name,
+            **stats,
+            'gemini': dict(scheduler.stats) if scheduler else None,
+            'cache': {'hits': cache.hits, 'misses': cache.misses} if cache else None,
+            'tls_cache_hits': self.parser.tls_scanner.hits,
+        }
+
+    def close(self):
+        self._call(self._stop_batch()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self.parser.transport.close()
+        if self.store:
+            self._writer.shutdown(wait=True)
+            self.store.close()
+
+    async def _stop_batch(self):
+        self.batch.stop()
+
+
+def parse_job(body: bytes, many: bool) -> Dict:
+    """Проверка JSON-задания: {"url": ...} или {"urls": [...]}, необязательный "deep\""""
+    try:
+        job = json.loads(body or b'{}')
+    except ValueError as e:
+        raise RequestError(400, f"Некорректный JSON: {e}")
+    if not isinstance(job, dict):
+        raise RequestError(400, "Ожидается JSON-объект")
+    if many:
+        urls = job.get('urls')
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url.strip() for url in urls):
+            raise RequestError(400, "Поле urls должно быть непустым списком строк")
+    elif not isinstance(job.get('url'), str) or not job['url'].strip():
+        raise RequestError(400, "Поле url обязательно")
+    if 'deep' in job and not isinstance(job['deep'], bool):
+        raise RequestError(400, "Поле deep должно быть true или false")
+    return job
+
+
+def make_handler(service: AnalysisService):
+    """Класс обработчика HTTP-запросов, привязанный к сервису"""
+
+    class ServiceHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+        server_version = 'ParsLinkAI'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self) -> bytes:
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                raise RequestError(400, "Некорректный Content-Length")
+            if length > MAX_REQUEST_BYTES:
+                raise RequestError(413, f"Тело запроса больше {MAX_REQUEST_BYTES} байт")
+            return self.rfile.read(length) if length else b''
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, service.health())
+            else:
+                self._send_json(404, {'error': f"Неизвестный путь: {self.path}"})
+
+        def do_POST(self):
+            service.count_request()
+            try:
+                if self.path == '/analyze':
+                    job = parse_job(self._read_body(), many=False)
+                    result = service.analyze(job['url'], job.get('deep'))
+                    self._send_json(422 if 'error' in result else 200, result)
+                elif self.path == '/analyze-many':
+                    job = parse_job(self._read_body(), many=True)
+                    self._stream(service.analyze_many(job['urls'], job.get('deep')))
+                else:
+                    self._send_json(404, {'error': f"Неизвестный путь: {self.path}"})
+            except RequestError as e:
+                # Тело могло остаться непрочитанным: соединение не переиспользуется
+                self.close_connection = True
+                self._send_json(e.status, {'error': str(e)})
+
+        def _stream(self, results):
+            """Результаты в формате NDJSON по мере готовности (chunked)"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for result in results:
+                    data = ndjson_line(result).encode('utf-8')
+                    self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Клиент отключился: оставшиеся сайты доанализируются и попадут в базу
+                self.close_connection = True
+
+    return ServiceHandler
+
+
+def create_server(service: AnalysisService, host: str = '127.0.0.1', port: int = 8787) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
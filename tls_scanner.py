@@ -0,0 +1,291 @@
+import asyncio
+import socket
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_PORT = 443
+
+
+def parse_target(value: str) -> Tuple[str, int]:
+    """Хост и порт из строки вида host, host:port или URL"""
+    value = value.strip()
+    parts = urlsplit(value if '://' in value else f'//{value}')
+    if not parts.hostname:
+        raise ValueError(f"Некорректный адрес: {value}")
+    return parts.hostname, parts.port or DEFAULT_PORT
+
+
+def _name(entries) -> Dict[str, str]:
+    """Поля subject/issuer сертификата в виде словаря"""
+    return {key: value for rdn in entries or () for key, value in rdn}
+
+
+def _cert_time(value: Optional[str]) -> Optional[float]:
+    try:
+        return ssl.cert_time_to_seconds(value) if value else None
+    except ValueError:
+        return None
+
+
+def _iso(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def peer_chain(ssl_object, verified: bool = True) -> List[Dict]:
+    """
+    Цепочка сертификатов соединения (от сертификата сайта к корню)
+
+    В Python 3.13+ доступны get_verified_chain()/get_unverified_chain(),
+    в 3.10-3.12 те же методы есть у внутреннего объекта _sslobj.
+    """
+    method = 'get_verified_chain' if verified else 'get_unverified_chain'
+    for owner in (ssl_object, getattr(ssl_object, '_sslobj', None)):
+        getter = getattr(owner, method, None)
+        if getter is None:
+            continue
+        try:
+            chain = getter() or []
+        except (ValueError, ssl.SSLError):
+            return []
+        result = []
+        for cert in chain:
+            info = cert.get_info() if hasattr(cert, 'get_info') else {}
+            result.append({
+                'subject': _name(info.get('subject')),
+                'issuer': _name(info.get('issuer')),
+                'not_before': _iso(_cert_time(info.get('notBefore'))),
+                'not_after': _iso(_cert_time(info.get('notAfter'))),
+                'serial': info.get('serialNumber'),
+                'sans': [value for kind, value in info.get('subjectAltName', ()) if kind in ('DNS', 'IP Address')],
+            })
+        return result
+    return []
+
+
+def certificate_details(ssl_object, verified: bool = True, error: Optional[str] = None) -> Dict:
+    """
+    Сведения о сертификате и параметрах TLS-соединения
+
+    Подходит и для ssl.SSLSocket (соединение из пула HTTP), и для
+    ssl.SSLObject (асинхронное соединение сканера). Для непроверенного
+    соединения данные сертификата берутся из цепочки.
+    """
+    chain = peer_chain(ssl_object, verified)
+    cert = ssl_object.getpeercert() if verified else {}
+    if not cert and chain:
+        leaf = chain[0]
+        subject, issuer = leaf['subject'], leaf['issuer']
+        not_before, not_after = leaf['not_before'], leaf['not_after']
+        expires = None
+        sans = leaf['sans']
+    else:
+        subject, issuer = _name(cert.get('subject')), _name(cert.get('issuer'))
+        not_before = _iso(_cert_time(cert.get('notBefore')))
+        not_after = _iso(_cert_time(cert.get('notAfter')))
+        expires = cert.get('notAfter')
+        sans = [value for kind, value in cert.get('subjectAltName', ()) if kind in ('DNS', 'IP Address')]
+
+    expires_days = None
+    if not_after:
+        expiry = datetime.fromisoformat(not_after).replace(tzinfo=timezone.utc)
+        expires_days = round((expiry - datetime.now(timezone.utc)).total_seconds() / 86400, 1)
+
+    info = {
+        'valid': verified and error is None,
+        'subject': subject,
+        'issuer': issuer,
+        'sans': sans,
+        'not_before': not_before,
+        'not_after': not_after,
+        'expires': expires or (datetime.fromisoformat(not_after).strftime('%b %d %H:%M:%S %Y GMT') if not_after else None),
+        'expires_days': expires_days,
+        'version': ssl_object.version(),
+        'cipher': ssl_object.cipher(),
+        'chain': chain,
+    }
+    if error:
+        info['error'] = error
+    return info
+
+
+def _unverified_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class TlsScanner:
+    """
+    Сканер TLS-сертификатов
+
+    Handshake выполняется асинхронно для множества хостов одновременно со
+    строгим таймаутом на соединение целиком (DNS, TCP, TLS). Результаты
+    кэшируются по host:port на ttl секунд (ошибки — на error_ttl), в кэше
+    не больше max_entries хостов, а одновременные запросы к одному хосту
+    объединяются. Если сертификат
+    не проходит проверку, соединение повторяется без проверки, чтобы
+    получить срок действия и цепочку.
+    """
+
+    def __init__(self, timeout: float = 5.0, concurrency: int = 100,
+                 ttl: float = 3600, error_ttl: float = 60, max_entries: int = 10000,
+                 context: Optional[ssl.SSLContext] = None):
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max(0, max_entries)
+        self.context = context or ssl.create_default_context()
+        self.hits = 0
+        # (host, port) -> (время проверки, результат) в порядке последнего использования
+        self._cache: 'OrderedDict[Tuple[str, int], Tuple[float, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._loop = None
+
+    def _expired(self, stored: float, info: Dict, now: float) -> bool:
+        ttl = self.error_ttl if 'error' in info and not info.get('not_after') else self.ttl
+        return now - stored > ttl
+
+    def _cached(self, key: Tuple[str, int]) -> Optional[Dict]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if self._expired(*entry, time.time()):
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _store(self, key: Tuple[str, int], info: Dict) -> Dict:
+        now = time.time()
+        with self._lock:
+            self._cache[key] = (now, info)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_entries:
+                # Сначала удаляются устаревшие записи, затем давно не использовавшиеся (LRU)
+                for stale in [k for k, entry in self._cache.items() if self._expired(*entry, now)]:
+                    del self._cache[stale]
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return info
+
+    def _finish(self, host: str, port: int, start: float, info: Dict) -> Dict:
+        info.update(host=host, port=port, handshake_time=round(time.perf_counter() - start, 4),
+                    scanned_at=datetime.now().isoformat())
+        return self._store((host, port), info)
+
+    async def _handshake(self, host: str, port: int, context: ssl.SSLContext):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host,
+                                    ssl_handshake_timeout=self.timeout),
+            self.timeout
+        )
+        return writer
+
+    async def _scan(self, host: str, port: int) -> Dict:
+        start = time.perf_counter()
+        error = None
+        try:
+            writer = await self._handshake(host, port, self.context)
+            verified = True
+        except ssl.SSLCertVerificationError as e:
+            error = e.verify_message or str(e)
+            try:
+                writer = await self._handshake(host, port, _unverified_context())
+                verified = False
+            except Exception as retry_error:
+                return self._finish(host, port, start, {'valid': False, 'error': f"{error}; {retry_error}"})
+        except asyncio.TimeoutError:
+            return self._finish(host, port, start, {'valid': False, 'error': f"Превышено время ожидания ({self.timeout} сек)"})
+        except Exception as e:
+            # Сюда же попадают ошибки имени хоста (UnicodeError от idna и т.п.)
+            return self._finish(host, port, start, {'valid': False, 'error': str(e) or type(e).__name__})
+
+        try:
+            info = certificate_details(writer.get_extra_info('ssl_object'), verified, error)
+        finally:
+            writer.close()
+        return self._finish(host, port, start, info)
+
+    async def scan(self, host: str, port: int = DEFAULT_PORT) -> Dict:
+        """Асинхронная проверка сертификата host:port (с кэшем)"""
+        key = (host, port)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._inflight = {}
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        async def run():
+            async with self._semaphore:
+                return await self._scan(host, port)
+
+        future = asyncio.ensure_future(run())
+        self._inflight[key] = future
+
+        def release(done: asyncio.Future):
+            # Проверка завершилась, даже если все ожидающие уже отменены (таймаут этапа)
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    def scan_sync(self, host: str, port: int = DEFAULT_PORT, timeout: Optional[float] = None) -> Dict:
+        """Блокирующая проверка сертификата (для вызова из потоков)"""
+        timeout = timeout or self.timeout
+        key = (host, port)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        error = None
+        for context in (self.context, _unverified_context()):
+            try:
+                with socket.create_connection((host, port), timeout=timeout) as sock:
+                    with context.wrap_socket(sock, server_hostname=host) as ssock:
+                        info = certificate_details(ssock, error is None, error)
+                        return self._finish(host, port, start, info)
+            except ssl.SSLCertVerificationError as e:
+                error = e.verify_message or str(e)
+            except Exception as e:
+                message = str(e) or type(e).__name__
+                return self._finish(host, port, start, {'valid': False, 'error': f"{error}; {message}" if error else message})
+        return self._finish(host, port, start, {'valid': False, 'error': error})
+
+    async def scan_many(self, targets: Iterable[Tuple[str, int]]) -> List[Dict]:
+        """Проверка списка хостов с ограничением числа одновременных соединений"""
+        loop = asyncio.get_running_loop()
+        # Разрешение имен выполняется в пуле потоков: расширяем его под конкурентность
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=min(self.concurrency, 256)))
+        targets = list(targets)
+        results = await asyncio.gather(*(self.scan(host, port) for host, port in targets), return_exceptions=True)
+        # Ошибка одного хоста не прерывает проверку остальных
+        return [
+            {'valid': False, 'error': str(result) or type(result).__name__, 'host': host, 'port': port}
+            if isinstance(result, BaseException) else result
+            for (host, port), result in zip(targets, results)
+        ]
+
+    def sweep(self, targets: Iterable[Tuple[str, int]]) -> List[Dict]:
+        """Синхронная обертка над scan_many()"""
+        return asyncio.run(self.scan_many(list(targets)))
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Сетевые этапы в порядке выполнения внутри загрузки страницы
+NETWORK_STAGES = ('dns', 'connect', 'tls', 'ttfb', 'download')
+
+
+class Trace:
+    """
+    Замеры времени этапов анализа одного сайта
+
+    Каждый этап сохраняется как span с началом и длительностью
+    (time.perf_counter), что позволяет и получить сводку по этапам,
+    и выгрузить трассу в формате Chrome Trace Event.
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.spans: List[Dict] = []
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, start, time.perf_counter() - start, **args)
+
+    def add(self, name: str, start: float, duration: float, **args):
+        self.spans.append({
+            'name': name,
+            'start': start,
+            'duration': duration,
+            'thread': threading.get_ident(),
+            'args': args,
+        })
+
+    def add_network(self, timings: Optional[Dict[str, float]], start: float):
+        """Добавление сетевых этапов загрузки, идущих друг за другом с момента start"""
+        if not timings:
+            return
+        offset = start
+        for name in NETWORK_STAGES:
+            duration = timings.get(name)
+            if duration is None:
+                continue
+            self.add(name, offset, duration)
+            offset += duration
+
+    def timings(self) -> Dict[str, float]:
+        """Суммарная длительность каждого этапа в секундах"""
+        result: Dict[str, float] = {}
+        for span in self.spans:
+            result[span['name']] = round(result.get(span['name'], 0.0) + span['duration'], 6)
+        return result
+
+    def total(self, name: str) -> float:
+        return self.timings().get(name, 0.0)
+
+
+def chrome_trace_events(traces: List[Trace]) -> List[Dict]:
+    """
+    События Chrome Trace Event Format (открываются в chrome://tracing и Perfetto)
+
+    Каждый сайт выводится отдельной дорожкой (tid), время — в микросекундах
+    от начала самого раннего этапа.
+    """
+    starts = [span['start'] for trace in traces for span in trace.spans]
+    if not starts:
+        return []
+    origin = min(starts)
+    events = []
+    for tid, trace in enumerate(traces, 1):
+        events.append({
+            'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+            'args': {'name': trace.name},
+        })
+        for span in trace.spans:
+            events.append({
+                'name': span['name'],
+                'cat': 'network' if span['name'] in NETWORK_STAGES else 'stage',
+                'ph': 'X',
+                'pid': 1,
+                'tid': tid,
+                'ts': round((span['start'] - origin) * 1e6, 1),
+                'dur': round(span['duration'] * 1e6, 1),
+                'args': dict(span['args'], url=trace.name),
+            })
+    return events
+
+
+def export_chrome_trace(traces: List[Trace], filename: str):
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': chrome_trace_events(traces), 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+class StageProfiler:
+    """
+    cProfile для этапов, выполняемых в разных потоках
+
+    Каждый поток профилируется своим cProfile.Profile, при сохранении
+    статистика всех потоков объединяется.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _profile(self):
+        import cProfile
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = cProfile.Profile()
+            self._local.profile = profile
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def run(self, func, *args, **kwargs):
+        profile = self._profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: одновременно активен только один профилировщик
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+
+    def dump(self, filename: str):
+        """Сохранение объединенной статистики (читается python -m pstats)"""
+        import pstats
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(filename)
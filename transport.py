@@ -0,0 +1,237 @@
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Коды ответов, при которых запрос повторяется
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Размер блока чтения тела ответа
+CHUNK_SIZE = 64 * 1024
+# Проверка степени сжатия начинается после стольких распакованных байт
+RATIO_CHECK_BYTES = 1024 * 1024
+
+
+class DownloadLimitError(Exception):
+    """Загрузка прервана из-за подозрительного ответа (например, zip-бомбы)"""
+
+
+def enable_http2() -> bool:
+    """
+    Включение экспериментальной поддержки HTTP/2 в urllib3
+
+    Требует urllib3>=2.3 и пакет h2 4.x, при их отсутствии
+    транспорт продолжает работать по HTTP/1.1.
+    """
+    try:
+        import urllib3.http2
+        urllib3.http2.inject_into_urllib3()
+        return True
+    except (ImportError, AttributeError):
+        return False
+
+
+class _TimedConnectionMixin:
+    """
+    Замер DNS и TCP-соединения для нового соединения (TLS — в TimedHTTPSConnection)
+
+    Имя разрешается отдельно, чтобы измерить DNS, затем соединение
+    устанавливается с полученным адресом (SNI и Host остаются прежними).
+    Замеры сохраняются в атрибуте timings вместе с моментом начала
+    установки соединения, по которому запрос отличает свое новое
+    соединение от взятого из пула.
+    """
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        self.timings = {'started': start}
+        try:
+            infos = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            infos = []
+        self.timings['dns'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dns_host = self._dns_host
+        if infos:
+            self._dns_host = infos[0][4][0]
+        try:
+            sock = super()._new_conn()
+        except Exception:
+            if dns_host == self._dns_host:
+                raise
+            # Первый адрес недоступен: перебор всех адресов средствами urllib3
+            self._dns_host = dns_host
+            sock = super()._new_conn()
+        finally:
+            self._dns_host = dns_host
+        self.timings['connect'] = time.perf_counter() - start
+        return sock
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        # TLS-handshake — время connect() без уже замеренных DNS и TCP
+        start = time.perf_counter()
+        super().connect()
+        timings = getattr(self, 'timings', None)
+        if timings is not None:
+            elapsed = time.perf_counter() - start
+            timings['tls'] = max(0.0, elapsed - timings.get('dns', 0.0) - timings.get('connect', 0.0))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, создающий соединения с замерами времени"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class HttpTransport:
+    """
+    Общий HTTP-транспорт с пулом соединений и keep-alive
+
+    Все запросы к одному хосту (страница, robots.txt, sitemap.xml) используют
+    одни и те же TLS-соединения, сертификат читается из соединения страницы.
+    """
+
+    def __init__(self, pool_connections: int = 20, pool_maxsize: int = 10,
+                 retries: int = 2, backoff_factor: float = 0.5,
+                 http2: bool = False, headers: Optional[Dict[str, str]] = None,
+                 max_bytes: Optional[int] = None, max_ratio: Optional[float] = None):
+        self.http2 = enable_http2() if http2 else False
+        self.max_bytes = max_bytes
+        self.max_ratio = max_ratio
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        # Экспериментальный HTTP/2 заменяет класс соединений urllib3,
+        # поэтому замеры DNS/TCP/TLS для него недоступны
+        adapter_class = HTTPAdapter if self.http2 else TimedHTTPAdapter
+        adapter = adapter_class(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+            pool_block=False
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url: str, timeout: float = 30, **kwargs):
+        """GET-запрос через общий пул соединений"""
+        return self.session.get(url, timeout=timeout, **kwargs)
+
+    def fetch(self, url: str, timeout: float = 30,
+              sink: Optional[Callable] = None, **kwargs):
+        """
+        Потоковая загрузка страницы с получением сертификата из того же соединения
+
+        Информация о TLS сохраняется в атрибуте tls_info ответа (None для
+        HTTP), поэтому отдельный handshake для проверки SSL не нужен.
+        В атрибуте timings — длительность сетевых этапов в секундах:
+        dns, connect, tls (только для нового соединения), ttfb и download.
+
+        Тело читается блоками и хранится не больше max_bytes: остальное не
+        загружается, а ответ помечается truncated. sink(response) может
+        вернуть функцию, получающую распакованные блоки по мере загрузки;
+        время ее работы (sink_time) в download не входит. Размер на проводе
+        (transfer_size) и после распаковки (decoded_size) сохраняются отдельно.
+        """
+        start = time.perf_counter()
+        response = self.session.get(url, timeout=timeout, stream=True, **kwargs)
+        headers_received = time.perf_counter()
+        try:
+            connection = getattr(response.raw, 'connection', None)
+            response.tls_info = tls_info_from_response(response)
+            # Замеры установки учитываются, только если соединение открыто этим запросом
+            timings = dict(getattr(connection, 'timings', None) or {})
+            if timings.pop('started', 0.0) < start:
+                timings = {}
+            self._read_body(response, sink(response) if sink else None)
+        finally:
+            # Полностью прочитанное соединение возвращается в пул,
+            # прерванное — закрывается
+            response.close()
+        timings['download'] = max(0.0, time.perf_counter() - headers_received - response.sink_time)
+        setup = timings.get('dns', 0.0) + timings.get('connect', 0.0) + timings.get('tls', 0.0)
+        timings['ttfb'] = max(0.0, headers_received - start - setup)
+        response.timings = timings
+        return response
+
+    def _read_body(self, response, consumer: Optional[Callable[[bytes], None]]):
+        """Чтение тела с ограничением размера и степени сжатия"""
+        chunks = []
+        decoded = 0
+        truncated = False
+        response.sink_time = 0.0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if self.max_bytes is not None and decoded + len(chunk) > self.max_bytes:
+                chunk = chunk[:self.max_bytes - decoded]
+                truncated = True
+            decoded += len(chunk)
+            if chunk:
+                chunks.append(chunk)
+                if consumer:
+                    consumer_start = time.perf_counter()
+                    consumer(chunk)
+                    response.sink_time += time.perf_counter() - consumer_start
+            if truncated:
+                break
+            if self.max_ratio and decoded > RATIO_CHECK_BYTES:
+                encoded = response.raw.tell() or 1
+                if decoded / encoded > self.max_ratio:
+                    raise DownloadLimitError(
+                        f"Степень сжатия ответа превышает {self.max_ratio:g}:1 "
+                        f"({encoded} байт распаковываются в {decoded}+)"
+                    )
+        response._content = b''.join(chunks)
+        response._content_consumed = True
+        response.truncated = truncated
+        response.decoded_size = decoded
+        response.transfer_size = response.raw.tell()
+
+    def close(self):
+        """Закрытие всех соединений пула"""
+        self.session.close()
+
+
+def tls_info_from_response(response) -> Optional[Dict]:
+    """Сведения о TLS из соединения, через которое получен ответ"""
+    from tls_scanner import certificate_details
+
+    connection = getattr(response.raw, 'connection', None)
+    sock = getattr(connection, 'sock', None)
+    if sock is None or not hasattr(sock, 'getpeercert'):
+        return None
+    try:
+        return certificate_details(sock)
+    except (ValueError, OSError, KeyError):
+        return None